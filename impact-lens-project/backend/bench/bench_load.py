@@ -0,0 +1,200 @@
+"""Load test for the analysis endpoints at a fixed request rate.
+
+By default the app runs in this process with Gemini replaced by the local
+stand-in from fake_gemini, so no quota is used and the numbers reflect our own
+request path: text preparation, caching, parsing and enrichment fan-out. With
+--url the load goes to a running server instead (start that one with the fake
+installed, or accept that it calls the real API).
+
+Requests are sent open-loop: one every 1/--rps seconds regardless of how many
+are still waiting, so queueing in the app shows up as latency rather than as a
+lower send rate. Reports p50/p95/p99 latency, throughput, status codes and the
+resident memory of every worker process sampled during the run.
+
+Requires httpx (pip install httpx).
+
+Usage (from backend/):
+    python bench/bench_load.py --rps 20 --duration 30 [--latency 0.8 --jitter 0.3 --error-rate 0.02]
+    python bench/bench_load.py --rps 50 --endpoint /analyze/stream --repeat 0.3
+    python bench/bench_load.py --url http://localhost:8000 --pid 4121 --pid 4122
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "regering kabinet minister begroting defensie uitgaven belasting gemeente provincie onderzoek "
+    "rapport cijfers procent miljard euro maatregel wet voorstel kamer debat oppositie coalitie "
+    "zorg onderwijs woningmarkt huurprijzen energie klimaat stikstof landbouw inflatie lonen "
+    "werkgevers vakbond staking rechter uitspraak politie veiligheid europa navo oekraïne"
+).split()
+
+
+def make_article(index: int, words: int) -> Dict[str, str]:
+    """A synthetic news article, identical for the same index"""
+    rng = random.Random(index)
+    sentences = []
+    while sum(len(sentence.split()) for sentence in sentences) < words:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        sentences.append(sentence.capitalize() + ".")
+    return {
+        "url": f"https://example.nl/nieuws/{index}",
+        "title": f"Artikel {index}: " + " ".join(rng.choice(WORDS) for _ in range(5)),
+        "text": " ".join(sentences),
+        "language": "nl",
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def rss_mb(pid: str = "self") -> Optional[float]:
+    """Resident memory of a process in MB, from /proc where available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == "self":
+        # Peak rather than current, but better than nothing off Linux (ru_maxrss is KB there)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+class Results:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_byte: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.sent = 0
+
+    def record(self, status: str, latency: float, first_byte: Optional[float] = None) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == "200":
+            self.latencies.append(latency)
+            if first_byte is not None:
+                self.first_byte.append(first_byte)
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, body: dict, results: Results) -> None:
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", endpoint, json=body) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.record(status, time.perf_counter() - start, first_byte)
+
+
+async def sample_memory(pids: List[str], peaks: Dict[str, float], stop: asyncio.Event) -> None:
+    while True:
+        for pid in pids:
+            rss = rss_mb(pid)
+            if rss is not None:
+                peaks[pid] = max(peaks.get(pid, 0.0), rss)
+        if stop.is_set():
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args: argparse.Namespace) -> None:
+    if args.url:
+        transport = None
+        base_url = args.url
+        pids = args.pid or []
+    else:
+        import fake_gemini
+        fake = fake_gemini.install(args.latency, args.jitter, args.error_rate)
+        # Injected errors would bury the report in tracebacks; set LOG_LEVEL to see them
+        os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://bench"
+        pids = ["self"]
+
+    start_rss = {pid: rss_mb(pid) for pid in pids}
+    peaks: Dict[str, float] = {}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(pids, peaks, stop))
+
+    results = Results()
+    total = int(args.rps * args.duration)
+    interval = 1 / args.rps
+    tasks = []
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        for i in range(total):
+            # Sleep until this request's slot; if we are behind, send straight away
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            index = random.randrange(max(1, i)) if i and random.random() < args.repeat else i
+            tasks.append(asyncio.create_task(send(client, args.endpoint, make_article(index, args.words), results)))
+            results.sent += 1
+        send_seconds = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    ok = len(results.latencies)
+    print(f"endpoint      {args.endpoint} ({'in-process, fake Gemini' if not args.url else args.url})")
+    print(f"sent          {results.sent} requests in {send_seconds:.1f}s ({(results.sent - 1) / max(send_seconds, 1e-9):.1f} rps, target {args.rps})")
+    print(f"completed     {ok} ok in {elapsed:.1f}s, throughput {ok / elapsed:.1f} rps")
+    print(f"status        {', '.join(f'{status}: {count}' for status, count in sorted(results.statuses.items()))}")
+    print(f"latency       p50 {percentile(results.latencies, 0.5) * 1000:.0f}ms  "
+          f"p95 {percentile(results.latencies, 0.95) * 1000:.0f}ms  "
+          f"p99 {percentile(results.latencies, 0.99) * 1000:.0f}ms  "
+          f"max {max(results.latencies, default=float('nan')) * 1000:.0f}ms")
+    # The in-process transport hands over the body in one piece, so first byte is only measured over HTTP
+    if args.endpoint.endswith("/stream") and args.url:
+        print(f"first byte    p50 {percentile(results.first_byte, 0.5) * 1000:.0f}ms  "
+              f"p95 {percentile(results.first_byte, 0.95) * 1000:.0f}ms  "
+              f"p99 {percentile(results.first_byte, 0.99) * 1000:.0f}ms")
+    for pid in pids:
+        before = start_rss.get(pid)
+        print(f"memory        worker {pid}: {before or float('nan'):.0f}MB at start, peak {peaks.get(pid, float('nan')):.0f}MB")
+    if not args.url:
+        print(f"fake gemini   {fake.calls} calls, {fake.errors} injected errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of sending")
+    parser.add_argument("--endpoint", default="/analyze", choices=["/analyze", "/analyze/stream"])
+    parser.add_argument("--words", type=int, default=600, help="words per synthetic article")
+    parser.add_argument("--repeat", type=float, default=0.0, help="share of requests for an article sent before (cache hits)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--pid", action="append", help="server worker pid to sample memory of (with --url), repeatable")
+    parser.add_argument("--latency", type=float, default=0.8, help="fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.3, help="fake Gemini latency jitter in seconds, +/-")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini calls that fail with 503/429")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Parse-time and recovery-rate benchmark for Gemini response parsing.
+
+Runs every file in bench/corpus through the single-pass extractor and through
+the previous find/replace/regex retry chain, and reports per-file timings and
+how many responses each recovered into a usable analysis.
+
+Usage (from backend/):
+    python bench/bench_parse.py [--iterations 2000] [--corpus bench/corpus]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_extract import extract_json  # noqa: E402
+
+# A response counts as recovered when these made it through; normalize_analysis defaults the rest
+REQUIRED_FIELDS = ("claim_summary", "critical_questions")
+
+
+def legacy_extract(response: str):
+    """The JSON handling parse_gemini_response used before the single-pass extractor"""
+    response = response.strip()
+    if "```json" in response:
+        start = response.find("```json") + 7
+        end = response.find("```", start)
+        if end != -1:
+            response = response[start:end]
+    elif "```" in response:
+        start = response.find("```") + 3
+        end = response.find("```", start)
+        if end != -1:
+            response = response[start:end]
+    response = response.strip()
+    start_idx = response.find('{')
+    end_idx = response.rfind('}')
+    if start_idx != -1 and end_idx != -1:
+        response = response[start_idx:end_idx + 1]
+    response = response.replace('\n', ' ').replace('\t', ' ')
+    response = re.sub(r',(\s*[}\]])', r'\1', response)
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        fixed = response.replace('“', '"').replace('”', '"')
+        fixed = fixed.replace('‘', "'").replace('’', "'")
+        fixed = fixed.replace('"| Antwoord":', '"antwoord":').replace('"| antwoord":', '"antwoord":')
+        pattern = r'\{\s*"Vraag":\s*"([^"]*)",?\s*"[|]?\s*[Aa]ntwoord":\s*"([^"]*)"\s*\}'
+        fixed = re.sub(pattern, r'"Vraag: \1 | Antwoord: \2"', fixed)
+        return json.loads(fixed)
+
+
+def recovered(parse, text: str) -> bool:
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = parse(text)
+    except Exception:
+        return False
+    return isinstance(result, dict) and all(field in result for field in REQUIRED_FIELDS)
+
+
+def time_per_call(parse, text: str, iterations: int) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(iterations):
+            try:
+                parse(text)
+            except Exception:
+                pass
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus"))
+    args = parser.parse_args()
+
+    files = sorted(name for name in os.listdir(args.corpus) if name.endswith(".txt"))
+    parsers = {"extractor": extract_json, "legacy": legacy_extract}
+    totals = {name: [0, 0.0] for name in parsers}
+
+    print(f"{'file':32} {'chars':>6}  {'extractor':>16}  {'legacy':>16}")
+    for name in files:
+        with open(os.path.join(args.corpus, name), encoding="utf-8") as f:
+            text = f.read()
+        cells = []
+        for label, parse in parsers.items():
+            ok = recovered(parse, text)
+            seconds = time_per_call(parse, text, args.iterations)
+            totals[label][0] += ok
+            totals[label][1] += seconds
+            cells.append(f"{seconds * 1e6:8.1f}us {'ok' if ok else 'FAIL':>5}")
+        print(f"{name:32} {len(text):6}  {'  '.join(cells)}")
+
+    print()
+    for label, (ok, seconds) in totals.items():
+        print(f"{label:10} recovered {ok}/{len(files)} ({ok / len(files):.0%}), mean {seconds / len(files) * 1e6:.1f}us per response")
+
+
+if __name__ == "__main__":
+    main()
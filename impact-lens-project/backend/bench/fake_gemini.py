@@ -0,0 +1,182 @@
+"""Local stand-in for the Gemini API, for load tests that must not spend quota.
+
+FakeGenerativeModel replaces genai.GenerativeModel and replays canned model
+output: analysis prompts get the hand-written responses in bench/corpus
+(including the malformed ones, so parsing is exercised), enrichment searches
+get short factual answers. fake_embed_content replaces genai.embed_content with
+a deterministic bag-of-words vector, so reworded questions still land near each
+other. Every call waits a configurable latency plus jitter and fails with a
+transient upstream error at the configured rate.
+
+Usage:
+    import fake_gemini
+    fake_gemini.install(latency=0.8, jitter=0.3, error_rate=0.02)
+    import main
+
+or serve the app with the fake in place, for bench_load.py --url (from backend/):
+    python bench/fake_gemini.py --port 8000 --latency 0.8 --jitter 0.3 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import random
+import re
+import sys
+import time
+from typing import Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai  # noqa: E402
+from google.api_core import exceptions as api_exceptions  # noqa: E402
+
+import gemini_client  # noqa: E402
+from prompts import SEARCH_PROMPTS  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+SEARCH_ANSWERS = [
+    "De NAVO-norm schrijft voor dat lidstaten 2% van hun bbp aan defensie besteden. Nederland haalde die norm in 2024 voor het eerst sinds 2008.",
+    "Volgens het CBS steeg de inflatie in 2023 gemiddeld met 3,8%. Vooral energie en voedsel werden duurder.",
+    "The measure takes effect on 1 January and applies to all new contracts. Existing contracts keep their current terms until renewal.",
+    "Die Kosten werden zu zwei Dritteln vom Bund getragen. Der Rest entfällt auf die Länder und Kommunen.",
+]
+
+# Prompts that start like this are enrichment searches, everything else is an analysis
+_SEARCH_HEADS = tuple(parts[0] for parts in SEARCH_PROMPTS.values())
+
+# Streamed responses arrive in pieces of about this many characters, the first one
+# after this share of the total latency
+STREAM_CHUNK_CHARS = 120
+FIRST_CHUNK_SHARE = 0.2
+
+# Fake embeddings hash every word into one of this many dimensions; an embedding call
+# takes this share of the configured latency
+EMBED_DIMENSIONS = 64
+EMBED_LATENCY_SHARE = 0.1
+
+
+class FakeConfig:
+    def __init__(self, latency: float = 0.8, jitter: float = 0.3, error_rate: float = 0.0, corpus_dir: str = CORPUS_DIR):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.responses = load_responses(corpus_dir)
+        self._next_response = itertools.cycle(self.responses)
+        self._next_answer = itertools.cycle(SEARCH_ANSWERS)
+        self.calls = 0
+        self.errors = 0
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def fail_randomly(self) -> None:
+        """Count a call and raise the injected upstream error at the configured rate"""
+        self.calls += 1
+        if random.random() < self.error_rate:
+            self.errors += 1
+            raise random.choice((api_exceptions.ServiceUnavailable, api_exceptions.ResourceExhausted))("Injected by fake_gemini")
+
+    def respond(self, prompt) -> str:
+        """Pick the replayed text for a prompt, or raise the injected upstream error"""
+        self.fail_randomly()
+        if str(prompt).startswith(_SEARCH_HEADS):
+            return next(self._next_answer)
+        return next(self._next_response)
+
+
+config: Optional[FakeConfig] = None
+
+
+def load_responses(corpus_dir: str) -> List[str]:
+    responses = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+                responses.append(f.read())
+    if not responses:
+        raise ValueError(f"No recorded responses in {corpus_dir}")
+    return responses
+
+
+class FakeResponse:
+    def __init__(self, text: str, delay: float = 0.0):
+        self.text = text
+        self._delay = delay
+
+    def _pieces(self) -> List[str]:
+        return [self.text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(self.text), STREAM_CHUNK_CHARS)] or [""]
+
+    def __iter__(self) -> Iterator["FakeResponse"]:
+        pieces = self._pieces()
+        for piece in pieces:
+            time.sleep(self._delay / len(pieces))
+            yield FakeResponse(piece)
+
+    async def __aiter__(self):
+        pieces = self._pieces()
+        for piece in pieces:
+            await asyncio.sleep(self._delay / len(pieces))
+            yield FakeResponse(piece)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name: str = "gemini-fake", generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs) -> FakeResponse:
+        delay = config.delay()
+        time.sleep(delay * FIRST_CHUNK_SHARE if stream else delay)
+        text = config.respond(prompt)
+        return FakeResponse(text, delay * (1 - FIRST_CHUNK_SHARE) if stream else 0.0)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs) -> FakeResponse:
+        delay = config.delay()
+        await asyncio.sleep(delay * FIRST_CHUNK_SHARE if stream else delay)
+        text = config.respond(prompt)
+        return FakeResponse(text, delay * (1 - FIRST_CHUNK_SHARE) if stream else 0.0)
+
+
+def fake_embed_content(model: str = "", content: str = "", task_type: Optional[str] = None, **kwargs) -> dict:
+    """Same text, same vector; texts sharing most of their words get a high cosine similarity"""
+    time.sleep(config.delay() * EMBED_LATENCY_SHARE)
+    config.fail_randomly()
+    vector = [0.0] * EMBED_DIMENSIONS
+    for word in re.findall(r"\w+", str(content).lower()):
+        # A stable hash rather than hash(), which differs between processes
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+        vector[int.from_bytes(digest, "big") % EMBED_DIMENSIONS] += 1.0
+    return {"embedding": vector}
+
+
+def install(latency: float = 0.8, jitter: float = 0.3, error_rate: float = 0.0, corpus_dir: str = CORPUS_DIR) -> FakeConfig:
+    """Route all Gemini calls, generation and embedding, through the stand-in"""
+    global config
+    config = FakeConfig(latency, jitter, error_rate, corpus_dir)
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.embed_content = fake_embed_content
+    # Model objects are cached per generation config; drop any real ones
+    gemini_client.get_model.cache_clear()
+    return config
+
+
+def serve():
+    parser = argparse.ArgumentParser(description="Serve the app with Gemini replaced by the local stand-in")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    install(args.latency, args.jitter, args.error_rate)
+
+    import uvicorn
+    import main
+    # The app object rather than "main:app", so the patched module is the one served
+    uvicorn.run(main.app, host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str:
+    """Drop fragments, trailing slashes and case differences that don't change the article"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def content_key(url: str, title: str, text: str, language: str, prompt_version: str) -> str:
+    """Stable hash of everything that influences the model output for an article"""
+    payload = json.dumps(
+        [
+            normalize_url(url),
+            " ".join(title.split()),
+            " ".join(text.split()),
+            (language or "nl").lower(),
+            prompt_version,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, so case, punctuation and spacing variants share an entry"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"^\s*(vraag|question|frage|pregunta)\s*:", "", text)
+    return " ".join(re.findall(r"\w+", text))
+
+
+def question_key(question: str, language: str, prompt_version: str) -> str:
+    payload = json.dumps([normalize_question(question), (language or "nl").lower(), prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def revision_key(url: str, language: str, prompt_version: str) -> str:
+    """One key per article page, whatever its current content"""
+    payload = json.dumps([normalize_url(url), (language or "nl").lower(), prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Bounded in-memory LRU with per-entry expiry and an optional SQLite tier.
+
+    Values must be JSON serializable. The SQLite tier survives restarts and is
+    consulted on a memory miss; hits from disk are promoted back into memory.
+    """
+
+    # Expired rows are purged from disk once every this many writes
+    PURGE_INTERVAL = 256
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, db_path: Optional[str] = None, table: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str, record: bool = True) -> Optional[Any]:
+        """Look up a live value; record=False leaves the hit/miss counters alone (for polling)"""
+        entry = self.get_entry(key, record)
+        return entry[1] if entry is not None else None
+
+    def get_entry(self, key: str, record: bool = True) -> Optional[Tuple[float, Any]]:
+        """Like get(), but returns (expires_at, value) so callers can tell how long it stays live"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    if record:
+                        self.hits += 1
+                    return entry
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    if record:
+                        self.disk_hits += 1
+                    return row[1], value
+
+            if record:
+                self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at),
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_INTERVAL == 0:
+                    self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def _store(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key onto one shared in-flight task.
+
+    The work runs as its own task, so a disconnecting caller does not cancel it
+    for the others; every waiter receives the same result or exception.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to timeout for in-flight work, including work nobody awaits anymore; returns what is left"""
+        tasks = list(self._inflight.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        return sum(1 for task in tasks if not task.done())
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+class EventLog:
+    """Progress events of one in-flight piece of work, for every caller following it.
+
+    Followers that join late first get the events emitted so far; following
+    ends once the log is closed.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[str, Any, dict]] = []
+        self.closed = False
+        self._updated = asyncio.Event()
+
+    def emit(self, event: str, data: Any, **extra) -> None:
+        self.events.append((event, data, extra))
+        self._wake()
+
+    def emitted(self, event: str) -> bool:
+        return any(name == event for name, _, _ in self.events)
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def follow(self) -> AsyncIterator[Tuple[str, Any, dict]]:
+        index = 0
+        while True:
+            # Taken before replaying, so an event emitted while a follower is suspended still wakes it
+            updated = self._updated
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.closed:
+                return
+            await updated.wait()
+
+
+class LeaseTable:
+    """Short-lived, cross-process locks on keys in SQLite.
+
+    SingleFlight coalesces work within one process; with several worker
+    processes on a shared database, a lease makes sure only one of them works
+    on a key while the others wait for its result. A lease expires after ttl
+    seconds so a crashed holder can't block a key for long. Without db_path
+    every acquire succeeds.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 120.0):
+        self.ttl = ttl
+        self.owner = str(os.getpid())
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def acquire(self, key: str) -> bool:
+        if self._db is None:
+            return True
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ?",
+                (key, self.owner, now + self.ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
@@ -0,0 +1,74 @@
+import math
+import operator
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+
+def unit_vector(values: Sequence[float]) -> Optional[Tuple[float, ...]]:
+    # A tuple rather than array("f"): the scan multiplies ready-made floats instead of boxing them per element
+    norm = math.sqrt(sum(value * value for value in values))
+    if norm == 0:
+        return None
+    return tuple(value / norm for value in values)
+
+
+class EmbeddingIndex:
+    """Nearest-neighbour lookup from embedded texts to cache keys, per language.
+
+    A brute-force cosine scan in pure Python: about 40µs per entry for
+    768-dimensional embeddings, so ~10ms at the default 256 entries and
+    ~80ms at 2000. find() holds the GIL for that long; callers on the event
+    loop run it in a thread. The oldest entries are dropped beyond max_entries.
+    """
+
+    def __init__(self, threshold: float, max_entries: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # language -> cache key -> unit vector, oldest first
+        self._vectors: Dict[str, "OrderedDict[str, Tuple[float, ...]]"] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def find(self, language: str, vector: Optional[Tuple[float, ...]]) -> Optional[Tuple[str, float]]:
+        """Key and cosine similarity of the closest entry at or above the threshold"""
+        best = None
+        if vector is not None:
+            with self._lock:
+                for key, other in self._vectors.get(language, {}).items():
+                    score = sum(map(operator.mul, vector, other))
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (key, score)
+        with self._lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def add(self, language: str, key: str, vector: Optional[Tuple[float, ...]]) -> None:
+        if vector is None:
+            return
+        with self._lock:
+            entries = self._vectors.setdefault(language, OrderedDict())
+            if key not in entries:
+                self._size += 1
+            entries[key] = vector
+            while self._size > self.max_entries:
+                # Drop the oldest entry of the largest language
+                largest = max(self._vectors.values(), key=len)
+                largest.popitem(last=False)
+                self._size -= 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from google.api_core import exceptions as api_exceptions
+
+from governor import CircuitBreaker, CircuitOpen, UpstreamGovernor, UpstreamUnavailable
+from telemetry import UPSTREAM_REJECTIONS, UPSTREAM_SECONDS, UPSTREAM_TOKENS
+from textprep import estimate_tokens
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/embedding-001")
+
+# Upper bound on concurrent upstream calls from this process. The async SDK path
+# holds no thread while waiting, so this can be far above the default thread pool size.
+MAX_INFLIGHT = int(os.getenv("GEMINI_MAX_INFLIGHT", "256"))
+
+upstream_slots = asyncio.Semaphore(MAX_INFLIGHT)
+_in_flight = 0
+
+# GEMINI_RPM and GEMINI_TPM are the project quota; each of the WEB_CONCURRENCY worker
+# processes gets an equal share of it. Calls slower than GEMINI_SLOW_CALL_SECONDS count as
+# failures for the circuit breaker.
+WORKER_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+governor = UpstreamGovernor(
+    requests_per_minute=float(os.getenv("GEMINI_RPM", "1000")) / WORKER_PROCESSES,
+    tokens_per_minute=float(os.getenv("GEMINI_TPM", "2000000")) / WORKER_PROCESSES,
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5")),
+        cooldown=float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30")),
+    ),
+    max_queue_wait=float(os.getenv("GEMINI_MAX_QUEUE_SECONDS", "10")),
+)
+SLOW_CALL_SECONDS = float(os.getenv("GEMINI_SLOW_CALL_SECONDS", "30"))
+
+# Upstream failures that are worth retrying later
+TRANSIENT_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.InternalServerError,
+    asyncio.TimeoutError,
+    UpstreamUnavailable,
+)
+
+
+@lru_cache(maxsize=32)
+def get_model(model_name: str, max_output_tokens: int, temperature: float) -> genai.GenerativeModel:
+    """One model object per (model, generation config), shared by all requests"""
+    return genai.GenerativeModel(
+        model_name,
+        generation_config=genai.types.GenerationConfig(
+            max_output_tokens=max_output_tokens,
+            temperature=temperature,
+        ),
+    )
+
+
+def warm_up() -> None:
+    """Build the shared model objects and the async gRPC client before the first request needs them"""
+    get_model(DEFAULT_MODEL, 1500, 0.3)
+    get_model(DEFAULT_MODEL, 1500, 0.2)
+    genai_client.get_default_generative_async_client()
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True if the error, or any exception it was raised from, is a retryable upstream failure"""
+    while error is not None:
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        error = error.__cause__
+    return False
+
+
+def in_flight() -> int:
+    return _in_flight
+
+
+async def generate(prompt: str, max_output_tokens: int = 1500, temperature: float = 0.3, model_name: str = DEFAULT_MODEL, call: str = "analysis", optional: bool = False) -> str:
+    """Run a single non-streaming generation on the SDK's async (grpc.aio) client.
+
+    Optional calls are shed instead of queued when the upstream is busy or unhealthy.
+    """
+    global _in_flight
+    model = get_model(model_name, max_output_tokens, temperature)
+    await admit(prompt, max_output_tokens, call, optional)
+    async with upstream_slots:
+        _in_flight += 1
+        start = time.perf_counter()
+        error = None
+        try:
+            response = await model.generate_content_async(prompt)
+            text = response.text
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _in_flight -= 1
+            settle(call, time.perf_counter() - start, error)
+    settle_tokens(call, prompt, text, max_output_tokens, getattr(response, "usage_metadata", None))
+    return text
+
+
+async def generate_stream(prompt: str, max_output_tokens: int = 1500, temperature: float = 0.3, model_name: str = DEFAULT_MODEL, call: str = "analysis", optional: bool = False) -> AsyncIterator[str]:
+    """Yield text chunks as the model produces them"""
+    global _in_flight
+    model = get_model(model_name, max_output_tokens, temperature)
+    await admit(prompt, max_output_tokens, call, optional)
+    async with upstream_slots:
+        _in_flight += 1
+        start = time.perf_counter()
+        error = None
+        chunks = []
+        try:
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                chunks.append(chunk.text)
+                yield chunks[-1]
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _in_flight -= 1
+            settle(call, time.perf_counter() - start, error)
+    settle_tokens(call, prompt, "".join(chunks), max_output_tokens, getattr(response, "usage_metadata", None))
+
+
+async def embed(text: str, model_name: str = EMBEDDING_MODEL, optional: bool = True) -> List[float]:
+    """Embedding for semantic similarity, admitted and counted like a generation.
+
+    The SDK only has a blocking call for this, so it runs in a thread. An
+    embedding only ever saves work, so by default it is shed rather than queued
+    when the upstream is busy or unhealthy.
+    """
+    global _in_flight
+    await admit(text, 0, "embed", optional)
+    async with upstream_slots:
+        _in_flight += 1
+        start = time.perf_counter()
+        error = None
+        try:
+            result = await asyncio.to_thread(genai.embed_content, model=model_name, content=text, task_type="semantic_similarity")
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _in_flight -= 1
+            settle("embed", time.perf_counter() - start, error)
+    return result["embedding"]
+
+
+async def admit(prompt: str, max_output_tokens: int, call: str, optional: bool) -> None:
+    # Budget for the longest possible answer; settle_tokens refunds what wasn't used
+    try:
+        await governor.admit(estimate_tokens(prompt) + max_output_tokens, optional)
+    except UpstreamUnavailable as e:
+        UPSTREAM_REJECTIONS.inc(call=call, reason="circuit_open" if isinstance(e, CircuitOpen) else "rate_limited")
+        raise
+
+
+def settle(call: str, seconds: float, error: Optional[BaseException]) -> None:
+    """Record a finished call for metrics and the circuit breaker"""
+    breaker = governor.breaker
+    if error is None:
+        outcome = "ok"
+        if seconds > SLOW_CALL_SECONDS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        # The caller gave up (client disconnect, search timeout); says nothing about Gemini
+        outcome = "cancelled"
+        breaker.cancel_probe()
+    elif is_transient_error(error):
+        outcome = "error"
+        breaker.record_failure()
+    else:
+        # Gemini answered, just not with something we could use
+        outcome = "error"
+        breaker.record_success()
+    UPSTREAM_SECONDS.observe(seconds, call=call, outcome=outcome)
+
+
+def settle_tokens(call: str, prompt: str, completion: str, max_output_tokens: int, usage) -> None:
+    # google-generativeai 0.3 does not report usage, newer versions do
+    if usage is not None:
+        prompt_tokens, completion_tokens = usage.prompt_token_count, usage.candidates_token_count
+    else:
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+    governor.tokens.refund(max(0, max_output_tokens - completion_tokens))
+    UPSTREAM_TOKENS.observe(prompt_tokens, call=call, direction="prompt")
+    UPSTREAM_TOKENS.observe(completion_tokens, call=call, direction="completion")
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class UpstreamUnavailable(Exception):
+    """Gemini can't take this call right now; clients should retry after retry_after seconds"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(UpstreamUnavailable):
+    """Our own requests/tokens-per-minute budget is used up"""
+
+    status_code = 429
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Recent upstream calls kept failing; calls are rejected until the cooldown ends"""
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute's worth.
+
+    Takes are reservations: the balance may go negative and the caller waits
+    until its share has been refilled, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self._tokens = float(rate_per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """Take amount and return how long to wait for it, or None (taking nothing) if that exceeds max_wait"""
+        self._refill()
+        # A single call bigger than the bucket would never fit; let it through on a full bucket
+        amount = min(amount, self.capacity)
+        wait = max(0.0, (amount - self._tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self._tokens -= amount
+        return wait
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failed or slow calls.
+
+    While open, calls are rejected until cooldown seconds have passed; then a
+    single probe call is let through (half-open) and its outcome closes or
+    reopens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def healthy(self) -> bool:
+        return self.state == self.CLOSED
+
+    def retry_after(self) -> float:
+        return max(1.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def cancel_probe(self) -> None:
+        """The call let through never reached Gemini, so another may probe"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class UpstreamGovernor:
+    """Admission control for every Gemini call made by this process.
+
+    Main analysis calls wait up to max_queue_wait for rate budget and are only
+    rejected while the circuit is open. Optional calls (enrichment searches)
+    never wait: they are shed as soon as the budget runs short or the circuit
+    is anything but closed.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, breaker: CircuitBreaker, max_queue_wait: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = breaker
+        self.max_queue_wait = max_queue_wait
+
+    async def admit(self, tokens: int, optional: bool = False) -> None:
+        """Wait for rate budget for one call of about this many tokens, or raise UpstreamUnavailable"""
+        if optional and not self.breaker.healthy():
+            raise CircuitOpen("Upstream unhealthy, skipping optional call", self.breaker.retry_after())
+        if not self.breaker.allow():
+            raise CircuitOpen("Gemini is tijdelijk niet beschikbaar", self.breaker.retry_after())
+
+        max_wait = 0.0 if optional else self.max_queue_wait
+        request_wait = self.requests.reserve(1, max_wait)
+        token_wait = self.tokens.reserve(tokens, max_wait) if request_wait is not None else None
+        if token_wait is None:
+            if request_wait is not None:
+                self.requests.refund(1)
+            if not optional and self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.cancel_probe()
+            raise RateLimited("Te veel analyses tegelijk, probeer het zo opnieuw", max(1.0, max_wait))
+        wait = max(request_wait, token_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "circuit_trips": self.breaker.trips,
+            "requests_available": round(self.requests.available(), 1),
+            "tokens_available": round(self.tokens.available()),
+        }
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it every client gets JSON
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class BufferedGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware for buffered responses only.
+
+    Starlette compresses streamed bodies without flushing, so NDJSON events
+    would sit in the compressor until it fills up; responses under skip_paths
+    are passed through as they are.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 6, skip_paths: Iterable[str] = ()):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def etag(payload) -> str:
+    """Weak validator for a JSON-serializable payload, the same in every encoding it is sent in"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return 'W/"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our tag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def wants_msgpack(accept: str) -> bool:
+    """Whether the client asked for msgpack and we can produce it"""
+    if msgpack is None:
+        return False
+    for item in accept.lower().split(","):
+        media_type, _, params = item.partition(";")
+        if media_type.strip() in MSGPACK_TYPES:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def negotiated_response(request: Request, payload: dict, headers: Optional[Dict[str, str]] = None) -> Response:
+    """payload as JSON or msgpack per the Accept header, or 304 when a GET client's copy is current.
+
+    If-None-Match is only evaluated for GET and HEAD; for other methods a
+    match would call for 412 (RFC 9110, 13.1.2), so there it is ignored.
+    """
+    tag = etag(payload)
+    headers = {**(headers or {}), "ETag": tag, "Vary": "Accept"}
+    if request.method in ("GET", "HEAD") and etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    if wants_msgpack(request.headers.get("accept", "")):
+        return Response(msgpack.packb(payload, use_bin_type=True), media_type=MSGPACK_TYPES[0], headers=headers)
+    return JSONResponse(payload, headers=headers)
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("impactlens.jobs")
+
+# Lower number is served first; bulk jobs only run when no premium/default work is due
+PRIORITIES = {"premium": 0, "default": 1, "bulk": 2}
+
+
+class JobQueue:
+    """Durable job queue in a local SQLite file.
+
+    Jobs move queued -> running -> done/failed. A transient failure puts the job
+    back in the queue with a run_after timestamp, and jobs left running by a
+    process that is gone are requeued by recover(). Claims take a write lock,
+    so several processes can drain the same file. Done and failed jobs are
+    deleted retention seconds after they finished (never if retention <= 0).
+    """
+
+    # Claims purge finished jobs at most once per this many seconds
+    PURGE_INTERVAL = 300.0
+
+    def __init__(self, db_path: str, max_attempts: int = 5, retention: float = 7 * 24 * 3600):
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._purged_at = 0.0
+        self.wakeup = asyncio.Event()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Workers start together on a shared file; take the write lock so only one creates or migrates the schema
+        self._db.execute("BEGIN IMMEDIATE")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner INTEGER
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, priority, run_after, created_at)")
+        # Queue files from before owner tracking lack the column
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self._db.execute("COMMIT")
+        # Set by close(): workers finish their current job and stop claiming
+        self.closing = False
+
+    def submit(self, payload: Dict[str, Any], priority: str = "default") -> str:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, priority, status, payload, run_after, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, PRIORITIES[priority], json.dumps(payload, ensure_ascii=False), now, now, now),
+            )
+        self.wakeup.set()
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the most urgent due job as running and return it, or None if nothing is due"""
+        if time.monotonic() - self._purged_at >= self.PURGE_INTERVAL:
+            self.purge()
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, payload, attempts FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                    "ORDER BY priority, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, updated_at = ? WHERE id = ?",
+                        (os.getpid(), now, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row["id"], "payload": json.loads(row["payload"]), "attempts": row["attempts"] + 1}
+
+    def complete(self, job_id: str, result: Any) -> None:
+        self._update(job_id, status="done", result=json.dumps(result, ensure_ascii=False), error=None)
+
+    def retry(self, job_id: str, error: str, delay: float) -> None:
+        self._update(job_id, status="queued", error=error, run_after=time.time() + delay)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, status="failed", error=error)
+
+    def recover(self) -> int:
+        """Requeue running jobs whose worker process is gone.
+
+        Jobs held by live processes (other workers sharing the file) are left alone.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall()
+            orphaned = [row["id"] for row in rows if not _process_alive(row["owner"])]
+            self._db.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), job_id) for job_id in orphaned],
+            )
+        return len(orphaned)
+
+    def purge(self) -> int:
+        """Delete done and failed jobs that finished more than retention seconds ago"""
+        self._purged_at = time.monotonic()
+        if self.retention <= 0:
+            return 0
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (time.time() - self.retention,)
+            )
+        if cursor.rowcount:
+            logger.info("Purged %d finished jobs", cursor.rowcount)
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.closing = True
+        self.wakeup.set()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["priority"] = next(name for name, value in PRIORITIES.items() if value == job["priority"])
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute("SELECT MIN(run_after) FROM jobs WHERE status = 'queued'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid():
+        # Our own jobs can only be left over from a previous process that had the same pid
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 300.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+async def worker(
+    queue: JobQueue,
+    handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+    is_transient: Callable[[Exception], bool],
+    poll_interval: float = 5.0,
+) -> None:
+    while not queue.closing:
+        job = queue.claim()
+        if job is None:
+            # Sleep until a submit wakes us, a retry becomes due, or the poll interval passes
+            due_in = queue.next_due_in()
+            timeout = poll_interval if due_in is None else min(poll_interval, due_in)
+            queue.wakeup.clear()
+            try:
+                await asyncio.wait_for(queue.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            result = await handler(job["payload"])
+        except Exception as e:
+            if is_transient(e) and job["attempts"] < queue.max_attempts:
+                delay = backoff_delay(job["attempts"])
+                logger.warning("Job %s attempt %d failed, retrying in %.1fs: %s", job["id"], job["attempts"], delay, e)
+                queue.retry(job["id"], str(e), delay)
+            else:
+                logger.warning("Job %s failed: %s", job["id"], e)
+                queue.fail(job["id"], str(e))
+        else:
+            queue.complete(job["id"], result)
+
+
+def start_workers(queue: JobQueue, handler: Callable[[Dict[str, Any]], Awaitable[Any]], is_transient: Callable[[Exception], bool], count: int) -> List[asyncio.Task]:
+    queue.recover()
+    return [asyncio.create_task(worker(queue, handler, is_transient)) for _ in range(count)]
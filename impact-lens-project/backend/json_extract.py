@@ -0,0 +1,345 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Typographic double quotes the model sometimes uses as JSON string delimiters
+SMART_QUOTES = "“”„"
+QUOTES = '"' + SMART_QUOTES
+
+# Characters that end a plain run inside a string
+_STRING_SPECIAL = re.compile('["\\\\' + SMART_QUOTES + "\\x00-\\x1f]")
+# One structural character or a run of literal characters (numbers, true/false/null)
+_TOKEN = re.compile('[' + QUOTES + '{}\\[\\],:]|[^\\s' + QUOTES + '{}\\[\\],:]+')
+_WHITESPACE = re.compile(r"\s*")
+# A "{" that opens JSON: followed by a key or by the end of an empty object, so braces
+# in the prose around it ("de analyse {zie hieronder}") are passed over
+_OBJECT_START = re.compile("\\{\\s*[" + QUOTES + "}]")
+# Code fence opener with its language tag
+_FENCE = re.compile(r"```[\w-]*")
+
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_CLOSERS = {"{": "}", "[": "]"}
+_OTHER_CLOSER = {"}": "]", "]": "}"}
+# Local repairs tried with the C parser before falling back to the token-by-token scan
+MAX_REPAIRS = 16
+# Raw control characters in strings are accepted as themselves: they are the most common
+# defect and decode to the same value as their escaped form
+_DECODER = json.JSONDecoder(strict=False)
+# The json module's C scanner: parses one value at an index, or raises if it isn't well-formed there
+_scan_value = _DECODER.scan_once
+
+
+class JsonExtractor:
+    """Single-pass tolerant extractor for the outermost JSON object in model output.
+
+    Text before the object (prose, code fences) and after the matching "}" is
+    ignored; the object starts at the first "{" followed by a key. While scanning
+    it repairs what Gemini commonly gets wrong: smart quotes used as delimiters,
+    unescaped quotes and raw newlines inside strings, trailing commas, missing
+    commas between values and truncated output.
+
+    Input can be fed in chunks; completed() returns the top-level members that
+    have been fully received so far, and result() parses the whole object.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._out: List[str] = []
+        self._stack: List[str] = []
+        # Per open container: True once an object member has seen its ":"
+        self._in_value: List[bool] = []
+        self._started = False
+        self._done = False
+        self._final = False
+        self._in_string = False
+        self._smart_string = False
+        # Set once a string was delimited by smart quotes; the model then tends to use them
+        # throughout, so whole values are no longer tried on the C scanner
+        self._smart_quotes = False
+        self._pending_comma = False
+        # Last structural thing emitted outside a string: "value", ":", "," or an opener
+        self._last = ""
+        # Number of output parts up to the last completed top-level member
+        self._member_end = 0
+
+    def feed(self, text: str) -> None:
+        if self._done:
+            return
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        self._scan()
+
+    def finish(self) -> None:
+        """Mark the input as complete so a quote at the very end can be resolved"""
+        self._final = True
+        if not self._done:
+            self._scan()
+
+    def completed(self) -> Dict[str, Any]:
+        """Top-level members whose values have been fully received"""
+        if self._member_end == 0:
+            return {}
+        try:
+            return _DECODER.decode("".join(self._out[:self._member_end]) + "}")
+        except json.JSONDecodeError:
+            return {}
+
+    def result(self) -> Any:
+        """Parse the object, closing it first if the input was truncated"""
+        self.finish()
+        if not self._started:
+            raise ValueError("No JSON object found in response")
+        text = "".join(self._out)
+        if not self._done:
+            closing = ['"'] if self._in_string else []
+            closing.extend(_CLOSERS[opener] for opener in reversed(self._stack))
+            text += "".join(closing)
+        try:
+            return _DECODER.decode(text)
+        except json.JSONDecodeError as e:
+            # A value was cut off mid-way; keep the members that did arrive
+            partial = self.completed()
+            if partial:
+                return partial
+            raise ValueError(f"Could not recover JSON object: {e}") from e
+
+    def _scan(self) -> None:
+        buffer = self._buffer
+        if not self._started:
+            match = _OBJECT_START.search(buffer, self._pos)
+            if match is None:
+                # Keep a trailing "{" whose next character hasn't arrived yet
+                brace = buffer.rfind("{", self._pos)
+                if brace != -1 and not self._final and not buffer[brace + 1:].strip():
+                    self._pos = brace
+                else:
+                    self._pos = len(buffer)
+                return
+            self._started = True
+            self._pos = match.start()
+
+        # State lives in locals for the loop and is written back at the end
+        out = self._out
+        append = out.append
+        stack = self._stack
+        in_value = self._in_value
+        last = self._last
+        pending_comma = self._pending_comma
+        in_string = self._in_string
+        smart_string = self._smart_string
+        smart_quotes = self._smart_quotes
+        member_end = self._member_end
+        search_token = _TOKEN.search
+        search_special = _STRING_SPECIAL.search
+        pos = self._pos
+        end = len(buffer)
+        while pos < end:
+            if in_string:
+                match = search_special(buffer, pos)
+                if match is None:
+                    append(buffer[pos:])
+                    pos = end
+                    break
+                special = match.start()
+                if special > pos:
+                    append(buffer[pos:special])
+                pos = special
+                char = buffer[pos]
+                if char == "\\":
+                    if pos + 1 == end:
+                        if self._final:
+                            # Dangling backslash at the very end: drop it
+                            pos = end
+                        break
+                    append(buffer[pos:pos + 2])
+                    pos += 2
+                elif char == '"' or smart_string:
+                    closes = self._closes_string(buffer, pos + 1)
+                    if closes is None:
+                        # Need to see what follows the quote before deciding
+                        break
+                    if closes:
+                        append('"')
+                        in_string = False
+                        last = "value"
+                        if len(stack) == 1 and in_value[0]:
+                            member_end = len(out)
+                    else:
+                        append('\\"' if char == '"' else char)
+                    pos += 1
+                elif char in SMART_QUOTES:
+                    append(char)
+                    pos += 1
+                else:
+                    append(_CONTROL_ESCAPES.get(char, "\\u%04x" % ord(char)))
+                    pos += 1
+                continue
+
+            match = search_token(buffer, pos)
+            if match is None:
+                pos = end
+                break
+            token = match.group()
+            first = token[0]
+            if stack and not smart_quotes and (first == '"' or first in _CLOSERS):
+                # A nested value that needs no repair is copied whole instead of token by token
+                start = match.start()
+                try:
+                    value_end = _scan_value(buffer, start)[1]
+                except (StopIteration, ValueError):
+                    value_end = 0
+                if value_end and (
+                    first != '"' or (value_end < end and buffer[value_end] in ",:}]") or self._closes_string(buffer, value_end)
+                ):
+                    if pending_comma or last == "value":
+                        append(",")
+                    pending_comma = False
+                    append(buffer[start:value_end])
+                    last = "value"
+                    if len(stack) == 1 and in_value[0]:
+                        member_end = len(out)
+                    pos = value_end
+                    continue
+            pos = match.end()
+            if first in QUOTES:
+                if pending_comma or last == "value":
+                    append(",")
+                pending_comma = False
+                append('"')
+                in_string = True
+                smart_string = first != '"'
+                smart_quotes = smart_quotes or smart_string
+            elif first in _CLOSERS:
+                if pending_comma or last == "value":
+                    append(",")
+                pending_comma = False
+                append(first)
+                stack.append(first)
+                in_value.append(False)
+                last = first
+            elif first == "}" or first == "]":
+                # Close whatever is open, even if the model used the wrong bracket
+                pending_comma = False
+                append(_CLOSERS[stack.pop()])
+                in_value.pop()
+                if not stack:
+                    self._done = True
+                    break
+                last = "value"
+                if len(stack) == 1 and in_value[0]:
+                    member_end = len(out)
+            elif first == ",":
+                pending_comma = last not in ("", ",", "{", "[")
+                last = ","
+                in_value[-1] = False
+            elif first == ":":
+                append(":")
+                last = ":"
+                in_value[-1] = True
+            elif first == "`":
+                # Stray code fence inside the object
+                continue
+            else:
+                if pos == end and not self._final:
+                    # The literal may go on in the next chunk
+                    pos = match.start()
+                    break
+                if pending_comma or last == "value":
+                    append(",")
+                pending_comma = False
+                append(token)
+                last = "value"
+                # One cut off by the end of the input (tru, 12) doesn't complete a member
+                if len(stack) == 1 and in_value[0] and pos < end:
+                    member_end = len(out)
+        self._pos = pos
+        self._last = last
+        self._pending_comma = pending_comma
+        self._in_string = in_string
+        self._smart_string = smart_string
+        self._smart_quotes = smart_quotes
+        self._member_end = member_end
+
+    def _closes_string(self, buffer: str, pos: int) -> Optional[bool]:
+        """Decide whether a quote ends the string, based on what follows it.
+
+        Returns None when the answer depends on input that hasn't arrived yet.
+        """
+        match = _WHITESPACE.match(buffer, pos)
+        nxt = match.end()
+        if nxt >= len(buffer):
+            return True if self._final else None
+        char = buffer[nxt]
+        if char in ",:}]":
+            return True
+        # A new string on the next line means the model forgot a comma
+        return char in QUOTES and "\n" in match.group()
+
+
+def _object_bounds(text: str) -> Tuple[int, int]:
+    """Start of the object and end of the text it can span: inside the code fence if
+    there is one (```json before a bare ```), else anywhere in the text."""
+    opener = text.find("```json")
+    if opener == -1:
+        opener = text.find("```")
+    if opener != -1:
+        fence = _FENCE.match(text, opener)
+        close = text.find("```", fence.end())
+        body_end = close if close != -1 else len(text)
+        match = _OBJECT_START.search(text, fence.end(), body_end)
+        if match is not None:
+            return match.start(), body_end
+    match = _OBJECT_START.search(text)
+    return (match.start(), len(text)) if match is not None else (-1, len(text))
+
+
+def _repair(text: str, error: json.JSONDecodeError) -> Optional[str]:
+    """Fix the defect the C parser stopped at, the way JsonExtractor would, or None if it isn't a simple one"""
+    pos = error.pos
+    if pos >= len(text):
+        return None
+    char = text[pos]
+    # Last character of what the parser accepted
+    prev = pos - 1
+    while prev >= 0 and text[prev] in " \t\r\n":
+        prev -= 1
+    if prev < 0:
+        return None
+    if error.msg.startswith(("Expecting value", "Expecting property name")):
+        # Trailing comma before a closing bracket
+        if char in "}]" and text[prev] == ",":
+            return text[:prev] + text[prev + 1:]
+        return None
+    if error.msg == "Expecting ',' delimiter" and char in "}]":
+        # The other bracket was expected: close what is open
+        return text[:pos] + _OTHER_CLOSER[char] + text[pos + 1:]
+    if error.msg not in ("Expecting ',' delimiter", "Expecting ':' delimiter") or char in ",:}]":
+        return None
+    if text[prev] == '"' and not (char in QUOTES and "\n" in text[prev + 1:pos]):
+        # The string didn't end at that quote
+        return text[:prev] + "\\" + text[prev:]
+    # Two values without a comma between them
+    return text[:prev + 1] + "," + text[prev + 1:]
+
+
+def extract_json(text: str) -> Any:
+    """Extract and parse the outermost JSON object in a model response"""
+    start, body_end = _object_bounds(text)
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    # Well-formed output (the common case) goes straight through the C parser, and so does
+    # output with a few local defects once they are repaired one at a time
+    end = text.rfind("}", start, body_end)
+    if end != -1:
+        candidate = text[start:end + 1]
+        for _ in range(MAX_REPAIRS):
+            try:
+                return _DECODER.decode(candidate)
+            except json.JSONDecodeError as e:
+                candidate = _repair(candidate, e)
+                if candidate is None:
+                    break
+    extractor = JsonExtractor()
+    extractor.feed(text[start:])
+    return extractor.result()
@@ -1,18 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import google.generativeai as genai
 import os
 import json
 import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from dotenv import load_dotenv
 
+import gemini_client
+import jobs
+import telemetry
+from cache import EventLog, LeaseTable, SingleFlight, TTLCache, content_key, normalize_question, question_key, revision_key
+from embedding_index import EmbeddingIndex, unit_vector
+from governor import UpstreamUnavailable
+from http_encoding import BufferedGZipMiddleware, negotiated_response
+from json_extract import JsonExtractor, extract_json
+from neardup import NearDuplicateIndex, signature
+from prompts import ANALYST_PREAMBLE, PROMPT_VERSION, render_analysis_prompt, render_search_prompt, render_update_prompt
+from serve import REQUEST_GRACE_SECONDS, SHUTDOWN_TIMEOUT
+from telemetry import ANALYSES, INCREMENTAL_UPDATES, PARSE_RESULTS, stage
+from textprep import PreparedArticle, diff_segments, estimate_tokens, prepare_article, segment_hashes, split_segments
+
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="Impact-Lens API", version="1.0.0")
+# LOG_LEVEL gates what is logged at all; LOG_SAMPLE_RATE thins out per-request DEBUG detail
+logger = telemetry.configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with stage("warm_up"):
+        try:
+            gemini_client.warm_up()
+        except Exception as e:
+            # Not fatal: the client is created on first use instead
+            logger.warning("Gemini client warm-up failed: %s", e)
+    job_workers.extend(jobs.start_workers(job_queue, run_job, gemini_client.is_transient_error, int(os.getenv("JOB_WORKERS", "2"))))
+    logger.info("Worker %d ready, prompt version %s", os.getpid(), PROMPT_VERSION)
+    yield
+    await drain(SHUTDOWN_TIMEOUT - REQUEST_GRACE_SECONDS)
+
+app = FastAPI(title="Impact-Lens API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for browser requests
 app.add_middleware(
@@ -21,17 +56,216 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Location", "Retry-After"],
+)
+
+# Buffered responses over GZIP_MIN_SIZE bytes are gzipped for clients that accept it;
+# the NDJSON streams stay uncompressed so every event is delivered as soon as it is ready
+app.add_middleware(
+    BufferedGZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1000")),
+    skip_paths=["/analyze/stream", "/analyze/batch"],
 )
 
+# Seconds browsers and CDNs may reuse GET /analysis/{content_hash} without revalidating,
+# capped at how long the entry stays cached (degraded analyses only DEGRADED_CACHE_TTL)
+ANALYSIS_HTTP_MAX_AGE = int(os.getenv("ANALYSIS_HTTP_MAX_AGE", "3600"))
+
 # Configure Gemini
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Analyses keyed on article content; set ANALYSIS_CACHE_DB to keep them across restarts
+analysis_cache = TTLCache(
+    max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 3600))),
+    db_path=os.getenv("ANALYSIS_CACHE_DB") or None,
+    table="analyses",
+)
+
+# Model input per call in (estimated) tokens. Longer articles are trimmed to their most
+# salient sentences; beyond ARTICLE_CHUNK_THRESHOLD they are analyzed in up to
+# ARTICLE_MAX_CHUNKS chunks whose results are merged
+ARTICLE_TOKEN_BUDGET = int(os.getenv("ARTICLE_TOKEN_BUDGET", "6000"))
+ARTICLE_CHUNK_THRESHOLD = int(os.getenv("ARTICLE_CHUNK_THRESHOLD", "12000"))
+ARTICLE_MAX_CHUNKS = int(os.getenv("ARTICLE_MAX_CHUNKS", "4"))
+# Billing counts at most this many words per analysis
+MAX_BILLED_WORDS = 5000
+# Questions and impact points kept when merging chunk analyses
+MAX_MERGED_ITEMS = 5
+# The parts of an analysis that come from the model
+ANALYSIS_FIELDS = ("claim_summary", "critical_questions", "impact_summary", "sources")
+
+# Syndicated copies of a story (same wire text on other sites) reuse its analysis when
+# their shingle similarity reaches NEARDUP_THRESHOLD. About 2 KB of memory per entry;
+# set NEARDUP_DB to rebuild the index from SQLite on restart, NEARDUP_MAX_ENTRIES=0 to disable
+near_duplicates = NearDuplicateIndex(
+    threshold=float(os.getenv("NEARDUP_THRESHOLD", "0.8")),
+    max_entries=int(os.getenv("NEARDUP_MAX_ENTRIES", "50000")),
+    db_path=os.getenv("NEARDUP_DB") or None,
+)
+
+# Live articles are re-sent as they grow. The last analysis and segment hashes are kept per
+# URL, and a new version whose segments changed by at most INCREMENTAL_MAX_CHANGE (share of
+# its segments, 0 disables) only sends the changed passages and the previous analysis to Gemini
+article_revisions = TTLCache(
+    max_entries=int(os.getenv("ARTICLE_REVISION_SIZE", "2048")),
+    ttl=float(os.getenv("ARTICLE_REVISION_TTL", str(24 * 3600))),
+    db_path=os.getenv("ARTICLE_REVISION_DB") or None,
+    table="revisions",
+)
+INCREMENTAL_MAX_CHANGE = float(os.getenv("INCREMENTAL_MAX_CHANGE", "0.5"))
+
+# Analyses that lost chunks or enrichment searches to rate limits, an open circuit or timeouts
+# are only cached this many seconds, so a short upstream hiccup doesn't degrade them for a day
+DEGRADED_CACHE_TTL = float(os.getenv("DEGRADED_CACHE_TTL", "120"))
+
+# Concurrent requests for the same article share a single upstream analysis. With several
+# worker processes on a shared ANALYSIS_CACHE_DB, a lease also keeps the other processes
+# from analyzing it at the same time: they wait for the result to appear in the cache
+analysis_flights = SingleFlight()
+# Progress of the analyses in flight, by cache key, for /analyze/stream requests to follow
+analysis_events: Dict[str, EventLog] = {}
+analysis_leases = LeaseTable(os.getenv("ANALYSIS_CACHE_DB") or None, ttl=float(os.getenv("ANALYSIS_LEASE_TTL", "120")))
+LEASE_POLL_INTERVAL = 0.25
+
+# Distinct articles analyzed at the same time by one /analyze/batch call, and the most
+# items one call may contain (larger batches get 413)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+# Submit-and-poll analyses, drained by JOB_WORKERS background workers. Finished jobs can be
+# polled for JOB_RETENTION seconds before they are deleted (0 keeps them)
+job_queue = jobs.JobQueue(
+    os.getenv("JOBS_DB", "jobs.db"),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    retention=float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600))),
+)
+job_workers = []
+
+async def drain(timeout: float):
+    """Let in-flight work finish before the process exits.
+
+    Uvicorn has already stopped accepting requests and waited for open ones;
+    what is left are analyses whose callers went away and running jobs.
+    """
+    job_queue.close()
+    workers = list(job_workers)
+    results = await asyncio.gather(
+        analysis_flights.drain(timeout),
+        answer_flights.drain(timeout),
+        asyncio.wait(workers, timeout=timeout) if workers else asyncio.sleep(0),
+    )
+    # Jobs still running now stay 'running' and are requeued once this process is gone
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    job_workers.clear()
+    logger.info("Worker %d stopped, %d analyses unfinished", os.getpid(), results[0] + results[1])
+
+# Scrape-time views of in-process state for /metrics
+telemetry.Callback(
+    "impactlens_cache_lookups_total",
+    "Analysis cache lookups by result",
+    lambda: {(result,): analysis_cache.stats()[result] for result in ("hits", "disk_hits", "misses")},
+    ["result"],
+    kind="counter",
+)
+telemetry.Callback(
+    "impactlens_cache_hit_ratio",
+    "Share of analysis cache lookups served from memory or disk",
+    lambda: {(): analysis_cache.stats()["hit_rate"]},
+)
+telemetry.Callback(
+    "impactlens_cache_entries",
+    "Analyses held in the in-memory cache tier",
+    lambda: {(): analysis_cache.stats()["entries"]},
+)
+telemetry.Callback(
+    "impactlens_neardup_lookups_total",
+    "Near-duplicate index lookups after an exact cache miss, by result",
+    lambda: {(result,): near_duplicates.stats()[result] for result in ("hits", "misses")},
+    ["result"],
+    kind="counter",
+)
+telemetry.Callback(
+    "impactlens_answer_cache_lookups_total",
+    "Enrichment answer cache lookups by result",
+    lambda: {(result,): answer_cache.stats()[result] for result in ("hits", "disk_hits", "misses")},
+    ["result"],
+    kind="counter",
+)
+telemetry.Callback(
+    "impactlens_coalesced_requests_total",
+    "Requests that waited on an identical in-flight analysis",
+    lambda: {(): analysis_flights.coalesced},
+    kind="counter",
+)
+telemetry.Callback(
+    "impactlens_in_flight",
+    "Work currently in progress",
+    lambda: {("upstream_calls",): gemini_client.in_flight(), ("analyses",): analysis_flights.stats()["in_flight"]},
+    ["kind"],
+)
+telemetry.Callback(
+    "impactlens_circuit_open",
+    "1 while the Gemini circuit breaker is open or probing",
+    lambda: {(): 0 if gemini_client.governor.breaker.healthy() else 1},
+)
+telemetry.Callback(
+    "impactlens_upstream_budget_available",
+    "Gemini requests and tokens left in this minute's budget",
+    lambda: {("requests",): gemini_client.governor.requests.available(), ("tokens",): gemini_client.governor.tokens.available()},
+    ["kind"],
+)
+telemetry.Callback(
+    "impactlens_jobs",
+    "Jobs in the queue by status",
+    lambda: {(status,): count for status, count in job_queue.stats().items()},
+    ["status"],
+)
+
+# Enrichment searches run concurrently: at most ENRICH_CONCURRENCY per analysis and
+# ENRICH_GLOBAL_LIMIT across the whole process, each capped at ENRICH_TIMEOUT seconds
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "4"))
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", "20"))
+enrichment_slots = asyncio.Semaphore(int(os.getenv("ENRICH_GLOBAL_LIMIT", "32")))
+# Upstream searches per analysis; questions beyond this keep the article's own answer
+ENRICH_MAX_SEARCHES = int(os.getenv("ENRICH_MAX_SEARCHES", "5"))
+SEARCH_UNAVAILABLE = "Informatie tijdelijk niet beschikbaar"
+
+# Enrichment answers are shared across articles, since the same factual questions come up
+# in every article on a topic. Keyed on the normalized question, language and prompt version
+answer_cache = TTLCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", str(3 * 24 * 3600))),
+    db_path=os.getenv("ANSWER_CACHE_DB") or None,
+    table="answers",
+)
+answer_flights = SingleFlight()
+# Setting ANSWER_FUZZY_THRESHOLD (cosine similarity, e.g. 0.92) also lets paraphrased questions
+# hit, at the cost of one embedding call per exact miss
+ANSWER_FUZZY_THRESHOLD = float(os.getenv("ANSWER_FUZZY_THRESHOLD", "0"))
+fuzzy_answers = (
+    EmbeddingIndex(ANSWER_FUZZY_THRESHOLD, max_entries=int(os.getenv("ANSWER_FUZZY_MAX_ENTRIES", "256")))
+    if ANSWER_FUZZY_THRESHOLD > 0 else None
+)
+
+# Retries of the main analysis call on transient Gemini errors, with jittered backoff.
+# Enrichment searches are never retried; they are skipped while the upstream is unhealthy.
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "2"))
+
 class AnalyzeRequest(BaseModel):
     url: str
     title: str
     text: str
     language: Optional[str] = "nl"  # Default to Dutch
 
+class JobRequest(AnalyzeRequest):
+    priority: Optional[str] = "default"  # premium, default or bulk
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[AnalyzeRequest]
+
 class Source(BaseModel):
     title: str
     url: str
@@ -46,248 +280,663 @@ class AnalyzeResponse(BaseModel):
 
 @app.get("/")
 async def root():
-    return {"message": "Impact-Lens API", "version": "1.0.0"}
+    return {"message": "Impact-Lens API", "version": "1.0.0", "prompt_version": PROMPT_VERSION}
 
 @app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_content(request: AnalyzeRequest):
+async def analyze_content(request: AnalyzeRequest, http_request: Request):
+    """The analysis, with an ETag and its location for revalidation: GET /analysis/{content_hash}"""
     try:
-        # Log incoming request for debugging
-        print(f"DEBUG - Received request:")
-        print(f"  URL: {request.url}")
-        print(f"  Title: {request.title}")
-        print(f"  Text length: {len(request.text)} chars")
-        print(f"  Text preview: {request.text[:100]}...")
-
-        # Count words for billing
-        word_count = len(request.text.split())
-        print(f"  Word count: {word_count}")
+        article = prepare_request(request)
+        result = await cached_analysis(request, article)
+        ANALYSES.inc(endpoint="analyze", outcome="ok")
+        return negotiated_response(
+            http_request,
+            result.model_dump(),
+            {"Content-Location": f"/analysis/{analysis_cache_key(request)}", "Cache-Control": "no-cache"},
+        )
 
-        if word_count < 50:
-            print(f"DEBUG - Text too short: {word_count} words (need 50+)")
-            raise HTTPException(status_code=400, detail=f"Text too short for analysis: {word_count} words (minimum 50 required)")
+    except HTTPException as e:
+        ANALYSES.inc(endpoint="analyze", outcome=str(e.status_code))
+        raise
+    except UpstreamUnavailable as e:
+        ANALYSES.inc(endpoint="analyze", outcome=str(e.status_code))
+        logger.warning("Analysis for %s refused: %s", request.url, e)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except Exception as e:
+        ANALYSES.inc(endpoint="analyze", outcome="error")
+        logger.exception("Analysis failed for %s", request.url)
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-        if word_count > 5000:
-            # Truncate if too long
-            words = request.text.split()[:5000]
-            request.text = " ".join(words)
-            word_count = 5000
+@app.get("/analysis/{content_hash}", response_model=AnalyzeResponse)
+async def get_analysis(content_hash: str, http_request: Request):
+    """A stored analysis by the content hash from Content-Location, cacheable by browsers and CDNs"""
+    entry = analysis_cache.get_entry(content_hash) if len(content_hash) == 64 else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    expires_at, cached = entry
+    max_age = max(0, min(ANALYSIS_HTTP_MAX_AGE, int(expires_at - time.time())))
+    return negotiated_response(http_request, cached, {"Cache-Control": f"public, max-age={max_age}"})
+
+@app.post("/analyze/stream")
+async def analyze_stream(request: AnalyzeRequest):
+    """Same analysis as /analyze, sent as NDJSON events while sections become available"""
+    article = prepare_request(request)
+    return StreamingResponse(stream_analysis(request, article), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+async def analyze_batch_endpoint(batch: BatchAnalyzeRequest):
+    """Analyze many articles; NDJSON lines with per-item status, in completion order"""
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(batch.items)} items (maximum {BATCH_MAX_ITEMS})")
+
+    async def lines():
+        async for item in analyze_batch(batch.items):
+            yield (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/analyze/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    payload = request.model_dump(exclude={"priority"})
+    try:
+        job_id = job_queue.submit(payload, request.priority or "default")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/analyze/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": datetime.fromtimestamp(job["created_at"]).isoformat(),
+        "updated_at": datetime.fromtimestamp(job["updated_at"]).isoformat(),
+    }
 
-        # Create the analysis prompt with language support
-        analysis_prompt = create_analysis_prompt(request.title, request.text, request.language)
+@app.get("/analyze/jobs/{job_id}/result", response_model=AnalyzeResponse)
+async def job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+async def run_job(payload: dict) -> dict:
+    request = AnalyzeRequest(**payload)
+    try:
+        article = prepare_request(request)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+    result = await cached_analysis(request, article)
+    return result.model_dump()
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "analysis": analysis_cache.stats(),
+        "near_duplicates": near_duplicates.stats(),
+        "revisions": article_revisions.stats(),
+        "answers": answer_cache.stats(),
+        "fuzzy_answers": fuzzy_answers.stats() if fuzzy_answers is not None else None,
+        "coalescing": analysis_flights.stats(),
+        "upstream_in_flight": gemini_client.in_flight(),
+        "upstream": gemini_client.governor.stats(),
+    }
 
-        # Call Gemini for initial analysis
-        response = await call_gemini(analysis_prompt)
+def prepare_request(request: AnalyzeRequest) -> PreparedArticle:
+    """Validate the article and replace its text with the cleaned, budget-fitted version.
+
+    Also normalizes the language, so the prompt and every cache key see the same value,
+    and makes the request's log sampling decision.
+    """
+    telemetry.sample_request()
+    request.language = (request.language or "nl").strip().lower() or "nl"
+    with stage("validation"):
+        # Clean the text and count words (for billing) and tokens in one go
+        article = prepare_article(request.text, ARTICLE_TOKEN_BUDGET, ARTICLE_CHUNK_THRESHOLD, ARTICLE_MAX_CHUNKS)
+    word_count = article.word_count
+    logger.debug(
+        "Received %s: %d chars, %d words, prepared %d tokens in %d chunk(s)",
+        request.url, len(request.text), word_count, article.tokens, len(article.chunks) or 1,
+    )
+
+    if word_count < 50:
+        logger.info("Text too short for %s: %d words (need 50+)", request.url, word_count)
+        raise HTTPException(status_code=400, detail=f"Text too short for analysis: {word_count} words (minimum 50 required)")
+
+    request.text = article.text
+    return article
+
+def analysis_cache_key(request: AnalyzeRequest) -> str:
+    return content_key(request.url, request.title, request.text, request.language, PROMPT_VERSION)
+
+def neardup_namespace(request: AnalyzeRequest) -> str:
+    # Only reuse analyses made in the same language with the same prompts
+    return f"{request.language}:{PROMPT_VERSION}"
+
+def lookup_analysis(request: AnalyzeRequest, article: PreparedArticle, cache_key: str) -> Optional[dict]:
+    """The cached analysis of this article, or of a near-duplicate of it"""
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Cache hit for %s", request.url)
+        return cached
+
+    if INCREMENTAL_MAX_CHANGE > 0 and article_revisions.get(revision_key(request.url, request.language, PROMPT_VERSION), record=False):
+        # A new version of a page analyzed before: update that analysis rather than reuse it unchanged
+        return None
+
+    with stage("neardup"):
+        match = near_duplicates.find(neardup_namespace(request), signature(article.text))
+    if match is None:
+        return None
+    original_key, similarity = match
+    # The lookup above already counted this request as a cache miss
+    original = analysis_cache.get(original_key, record=False)
+    if original is None:
+        return None
+    logger.debug("Near-duplicate hit for %s (similarity %.2f)", request.url, similarity)
+    # Same story, but billing follows the length of this copy
+    adapted = {**original, "word_count": min(article.word_count, MAX_BILLED_WORDS)}
+    analysis_cache.set(cache_key, adapted)
+    return adapted
+
+def store_analysis(request: AnalyzeRequest, article: PreparedArticle, cache_key: str, result: dict, outcome: str = "complete") -> None:
+    """Cache a finished analysis.
+
+    One without parseable model output ("failed") is not kept. A "degraded"
+    one is kept for DEGRADED_CACHE_TTL seconds only, and is not used for
+    near-duplicates or as the baseline for incremental updates.
+    """
+    if outcome == "failed":
+        logger.info("Not caching analysis of %s: model output could not be parsed", request.url)
+        return
+    if outcome == "degraded":
+        analysis_cache.set(cache_key, result, ttl=DEGRADED_CACHE_TTL)
+        return
+    analysis_cache.set(cache_key, result)
+    near_duplicates.add(neardup_namespace(request), cache_key, signature(article.text))
+    article_revisions.set(
+        revision_key(request.url, request.language, PROMPT_VERSION),
+        {"segments": segment_hashes(split_segments(article.text)), "analysis": result},
+    )
+
+async def cached_analysis(request: AnalyzeRequest, article: PreparedArticle) -> AnalyzeResponse:
+    """Serve from the analysis cache, or run one shared analysis per content key"""
+    cache_key = analysis_cache_key(request)
+    cached = lookup_analysis(request, article, cache_key)
+    if cached is not None:
+        return AnalyzeResponse(**cached)
+    events, created = analysis_log(cache_key)
+    return await shared_analysis(request, article, cache_key, events, created)
+
+def analysis_log(cache_key: str) -> Tuple[EventLog, bool]:
+    """Event log of the analysis running for this key, or a new one; and whether it is new"""
+    events = analysis_events.get(cache_key)
+    if events is not None:
+        return events, False
+    events = analysis_events[cache_key] = EventLog()
+    return events, True
+
+def close_analysis_log(cache_key: str, events: EventLog) -> None:
+    events.close()
+    if analysis_events.get(cache_key) is events:
+        del analysis_events[cache_key]
+
+async def shared_analysis(request: AnalyzeRequest, article: PreparedArticle, cache_key: str, events: EventLog, created: bool) -> AnalyzeResponse:
+    """Run the analysis once per content key across requests and worker processes, publishing progress to events"""
+    started = False
+
+    async def analyze_and_store():
+        nonlocal started
+        started = True
+        try:
+            waited = False
+            while not analysis_leases.acquire(cache_key):
+                waited = True
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+            try:
+                # The previous lease holder has most likely stored the analysis by now
+                cached = analysis_cache.get(cache_key, record=False) if waited else None
+                if cached is not None:
+                    return AnalyzeResponse(**cached)
+                result, outcome = await run_analysis(request, article, events)
+                store_analysis(request, article, cache_key, result.model_dump(), outcome)
+                return result
+            finally:
+                analysis_leases.release(cache_key)
+        finally:
+            close_analysis_log(cache_key, events)
 
-        # Parse the response
-        print(f"Raw Gemini response: {response[:500]}...")
-        analysis = parse_gemini_response(response)
+    try:
+        return await analysis_flights.run(cache_key, analyze_and_store)
+    finally:
+        if created and not started:
+            # Joined a flight that was just finishing, so nothing will ever be emitted to this log
+            close_analysis_log(cache_key, events)
+
+async def analyze_batch(requests: List[AnalyzeRequest], concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[dict]:
+    """Analyze a batch with bounded concurrency, yielding one dict per item as it completes.
+
+    Items with identical content are analyzed once and reported under each of
+    their indices. Articles are prepared inside the concurrency slots, off the
+    event loop, so a large batch starts yielding without preparing every item
+    first. A failing item yields status "error" without stopping the batch.
+    """
+    # Group on the raw content; items that only become identical once prepared still
+    # share one analysis through analysis_flights and the cache
+    groups = {}
+    for index, request in enumerate(requests):
+        key = analysis_cache_key(request)
+        groups.setdefault(key, (request, []))[1].append(index)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def analyze_group(key: str):
+        request, indices = groups[key]
+        async with slots:
+            try:
+                # A decision made in the worker thread stays in its copy of the context, so the
+                # item is sampled here for its analysis as well
+                telemetry.sample_request()
+                article = await asyncio.to_thread(prepare_request, request)
+                return indices, await cached_analysis(request, article), None
+            except Exception as e:
+                return indices, None, e
+
+    for next_done in asyncio.as_completed([analyze_group(key) for key in groups]):
+        indices, result, error = await next_done
+        for index in indices:
+            url = requests[index].url
+            if error is None:
+                ANALYSES.inc(endpoint="batch", outcome="ok")
+                yield {"index": index, "url": url, "status": "ok", "result": result.model_dump()}
+            elif isinstance(error, HTTPException):
+                ANALYSES.inc(endpoint="batch", outcome=str(error.status_code))
+                yield {"index": index, "url": url, "status": "error", "status_code": error.status_code, "error": error.detail}
+            else:
+                ANALYSES.inc(endpoint="batch", outcome="error")
+                logger.warning("Batch item %d (%s) failed: %s", index, url, error)
+                yield {"index": index, "url": url, "status": "error", "status_code": getattr(error, "status_code", 500), "error": f"Analysis failed: {str(error)}"}
+
+async def run_analysis(request: AnalyzeRequest, article: PreparedArticle, events: EventLog) -> Tuple[AnalyzeResponse, str]:
+    """The analysis pipeline. Emits claim_summary, analysis and one question per enrichment as they become available.
+
+    Also returns the outcome: "complete"; "degraded" when chunks or enrichment
+    searches were lost to upstream trouble; or "failed" when no model output
+    could be parsed and the result is only the fallback structure.
+    """
+    with stage("analysis"):
+        analysis = await incremental_analysis(request, article)
+        if analysis is None and article.chunks:
+            analysis = await analyze_chunks(request, article.chunks)
+        elif analysis is None:
+            analysis = await analyze_text(request.title, request.text, request.language, events)
+        if not events.emitted("claim_summary"):
+            events.emit("claim_summary", analysis["claim_summary"])
+        events.emit("analysis", {field: analysis[field] for field in ANALYSIS_FIELDS})
 
         # Enhance answers with web search for questions that need more context
-        enhanced_questions = []
-        for question in analysis.get("critical_questions", []):
-            # Handle both string and dict format questions
-            if isinstance(question, dict):
-                # Convert dict format to our string format
-                vraag = question.get('vraag', '')
-                antwoord = question.get('antwoord', 'Niet vermeld in artikel')
-
-                # Check if this question needs web search enhancement
-                if "Niet vermeld in artikel" in antwoord:
-                    print(f"Searching for dict question: {vraag}")
-                    search_result = await search_web_with_gemini(vraag, request.language)
-                    if search_result and "Geen betrouwbare informatie gevonden" not in search_result and "tijdelijk niet beschikbaar" not in search_result:
-                        formatted_question = f"Vraag: {vraag} | Antwoord: {search_result}"
-                        enhanced_questions.append(formatted_question)
-                        print(f"Enhanced dict question with: {search_result[:100]}...")
-                    else:
-                        formatted_question = f"Vraag: {vraag} | Antwoord: {antwoord}"
-                        enhanced_questions.append(formatted_question)
-                else:
-                    formatted_question = f"Vraag: {vraag} | Antwoord: {antwoord}"
-                    enhanced_questions.append(formatted_question)
-                continue
-
-            # Convert to string if needed
-            question_str = str(question)
-
-            # Check if the question needs enhancement
-            needs_enhancement = (
-                "Niet vermeld in artikel" in question_str or
-                "niet beantwoord" in question_str.lower() or
-                "geen informatie" in question_str.lower() or
-                "niet duidelijk" in question_str.lower()
-            )
-
-            if needs_enhancement and "Vraag:" in question_str:
-                # Extract the question part for search
-                question_part = question_str.split("|")[0].replace("Vraag:", "").strip()
-
-                # Search for additional context using Gemini with web search
-                print(f"Searching for: {question_part}")
-                search_result = await search_web_with_gemini(question_part, request.language)
-
-                if search_result and "Geen betrouwbare informatie gevonden" not in search_result and "tijdelijk niet beschikbaar" not in search_result:
-                    enhanced_answer = f"Vraag: {question_part} | Antwoord: Online informatie: {search_result}"
-                    enhanced_questions.append(enhanced_answer)
-                    print(f"Enhanced question with: {search_result[:100]}...")
-                else:
-                    # Keep original if search didn't help
-                    enhanced_questions.append(question_str)
-                    print(f"No enhancement found for: {question_part}")
-            else:
-                # Keep questions that already have good answers
-                enhanced_questions.append(question_str)
-
-        analysis["critical_questions"] = enhanced_questions
-
-        return AnalyzeResponse(
-            claim_summary=analysis["claim_summary"],
-            critical_questions=analysis["critical_questions"],
-            impact_summary=analysis["impact_summary"],
-            sources=analysis["sources"],
-            word_count=word_count,
-            timestamp=datetime.now().isoformat()
-        )
+        budget = SearchBudget()
+        with stage("enrichment"):
+            analysis["critical_questions"] = await enhance_questions(analysis["critical_questions"], request.language, budget, events)
+
+    result = AnalyzeResponse(
+        claim_summary=analysis["claim_summary"],
+        critical_questions=analysis["critical_questions"],
+        impact_summary=analysis["impact_summary"],
+        sources=analysis["sources"],
+        word_count=min(article.word_count, MAX_BILLED_WORDS),
+        timestamp=datetime.now().isoformat()
+    )
+    if analysis.get("fallback"):
+        return result, "failed"
+    if analysis.get("partial") or budget.degraded:
+        return result, "degraded"
+    return result, "complete"
+
+async def analyze_text(title: str, text: str, language: str, events: Optional[EventLog] = None) -> dict:
+    # Create the analysis prompt with language support
+    with stage("prompt_build"):
+        analysis_prompt = create_analysis_prompt(title, text, language)
+
+    # Call Gemini for initial analysis, forwarding the claim summary as soon as it is
+    # complete in the token stream; the extractor is only fed until then
+    extractor = JsonExtractor() if events is not None else None
+    parts = []
+    with stage("call_gemini"):
+        async for chunk in call_gemini_stream(analysis_prompt):
+            parts.append(chunk)
+            if extractor is not None:
+                extractor.feed(chunk)
+                claim_summary = extractor.completed().get("claim_summary")
+                if isinstance(claim_summary, str):
+                    events.emit("claim_summary", claim_summary)
+                    extractor = None
+    response = "".join(parts)
+
+    # Parse the response
+    logger.debug("Raw Gemini response: %.500s", response)
+    with stage("parse"):
+        return parse_gemini_response(response)
+
+async def analyze_chunks(request: AnalyzeRequest, chunks: List[str]) -> dict:
+    """Map-reduce for long articles: analyze the chunks concurrently and merge the results"""
+    results = await asyncio.gather(
+        *(analyze_text(request.title, chunk, request.language) for chunk in chunks),
+        return_exceptions=True,
+    )
+    analyses = [result for result in results if not isinstance(result, BaseException)]
+    if not analyses:
+        raise results[0]
+    merged = merge_analyses(analyses)
+    if len(analyses) < len(results):
+        logger.warning("%d of %d chunk analyses failed, merging the rest", len(results) - len(analyses), len(results))
+        merged["partial"] = True
+    return merged
+
+def merge_analyses(analyses: List[dict]) -> dict:
+    """Combine per-chunk analyses, interleaving chunks so later parts of the article are represented"""
+    # Chunks whose output could not be parsed only contribute if all of them failed
+    analyses = [analysis for analysis in analyses if not analysis.get("fallback")] or analyses[:1]
+    if analyses[0].get("fallback"):
+        return analyses[0]
+
+    questions = {}
+    for question in interleave(analysis["critical_questions"] for analysis in analyses):
+        key = question.split("|")[0].lower().strip()
+        # Another chunk may answer what this one could not
+        if key not in questions or "Niet vermeld in artikel" in questions[key]:
+            questions[key] = question
+
+    impacts = {}
+    for impact in interleave(analysis["impact_summary"] for analysis in analyses):
+        impacts.setdefault(impact.lower().strip(), impact)
+
+    sources = {}
+    for source in (source for analysis in analyses for source in analysis["sources"]):
+        if isinstance(source, dict):
+            sources.setdefault(source.get("url"), source)
 
-    except Exception as e:
-        import traceback
-        print(f"Analysis error details: {str(e)}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    return {
+        # The lede in the first chunk carries the main claim
+        "claim_summary": analyses[0]["claim_summary"],
+        "critical_questions": list(questions.values())[:MAX_MERGED_ITEMS],
+        "impact_summary": list(impacts.values())[:MAX_MERGED_ITEMS],
+        "sources": list(sources.values()),
+    }
 
-def create_analysis_prompt(title: str, text: str, language: str = "nl") -> str:
+async def incremental_analysis(request: AnalyzeRequest, article: PreparedArticle) -> Optional[dict]:
+    """Update the previous analysis of this URL with the passages changed since, or None to analyze in full"""
+    if INCREMENTAL_MAX_CHANGE <= 0:
+        return None
+    revision = article_revisions.get(revision_key(request.url, request.language, PROMPT_VERSION))
+    if revision is None:
+        return None
+
+    segments = split_segments(article.text)
+    added, removed = diff_segments(revision["segments"], segment_hashes(segments))
+    passages = " ".join(segments[index] for index in added)
+    if len(added) + removed > INCREMENTAL_MAX_CHANGE * len(segments) or estimate_tokens(passages) > ARTICLE_TOKEN_BUDGET:
+        INCREMENTAL_UPDATES.inc(outcome="full")
+        return None
+    logger.debug("Incremental update for %s: %d new and %d removed of %d segments", request.url, len(added), removed, len(segments))
+
+    previous = revision["analysis"]
+    if not added:
+        # Only removals or reordering: the previous analysis still covers the article
+        INCREMENTAL_UPDATES.inc(outcome="unchanged")
+        return {field: previous[field] for field in ANALYSIS_FIELDS}
+
+    with stage("prompt_build"):
+        summary = {field: previous[field] for field in ("claim_summary", "critical_questions", "impact_summary")}
+        prompt = render_update_prompt(request.title, json.dumps(summary, ensure_ascii=False), passages, request.language)
+    with stage("call_gemini"):
+        response = await call_gemini(prompt)
+    with stage("parse"):
+        try:
+            update = extract_json(response)
+        except ValueError as e:
+            update = None
+            logger.warning("JSON parse error in incremental update: %s", e)
+    if not isinstance(update, dict):
+        INCREMENTAL_UPDATES.inc(outcome="fallback")
+        return None
+    INCREMENTAL_UPDATES.inc(outcome="updated")
+    return merge_update(previous, update)
+
+def merge_update(previous: dict, update: dict) -> dict:
+    """Fold an incremental update into the previous analysis.
+
+    New and changed questions and impact points go first; a question asked again
+    replaces its earlier version. Lists keep their previous length, or
+    MAX_MERGED_ITEMS if that is more.
+    """
+    claim_summary = update.get("claim_summary")
+    if not isinstance(claim_summary, str) or not claim_summary.strip():
+        claim_summary = previous["claim_summary"]
+
+    questions = {}
+    for question in format_questions(update.get("critical_questions")) + previous["critical_questions"]:
+        questions.setdefault(normalize_question(question.split("|")[0]), question)
+
+    impacts = {}
+    new_impacts = [impact for impact in update.get("impact_summary") or [] if isinstance(impact, str)]
+    for impact in new_impacts + previous["impact_summary"]:
+        impacts.setdefault(impact.lower().strip(), impact)
+
+    sources = {}
+    for source in list(previous["sources"]) + list(update.get("sources") or []):
+        if isinstance(source, dict):
+            sources.setdefault(source.get("url"), source)
 
-    # Language-specific prompts and instructions
-    prompts = {
-        "nl": {
-            "instruction": "Analyseer het volgende nieuwsartikel en geef een gestructureerde output in JSON formaat.",
-            "fields": {
-                "claim_summary": "Een korte, neutrale samenvatting van de hoofdclaim (max 3 zinnen) - leg afkortingen en technische termen uit, inclusief WHY en WHAT context",
-                "critical_questions": "Kritische vragen en antwoorden uit het artikel",
-                "impact_summary": "Concrete impact punten",
-                "sources": "Relevante bronnen"
-            },
-            "question_format": "Vraag: De eerste kritische vraag | Antwoord: Het antwoord uit het artikel",
-            "impact_format": "Impact punt 1: korte beschrijving van een concrete impact",
-            "language_instruction": "Gebruik Nederlandse taal"
-        },
-        "en": {
-            "instruction": "Analyze the following news article and provide a structured output in JSON format.",
-            "fields": {
-                "claim_summary": "A brief, neutral summary of the main claim (max 3 sentences) - explain abbreviations and technical terms, including WHY and WHAT context",
-                "critical_questions": "Critical questions and answers from the article",
-                "impact_summary": "Concrete impact points",
-                "sources": "Relevant sources"
-            },
-            "question_format": "Question: The first critical question | Answer: The answer from the article",
-            "impact_format": "Impact point 1: brief description of a concrete impact",
-            "language_instruction": "Use English language"
-        },
-        "de": {
-            "instruction": "Analysieren Sie den folgenden Nachrichtenartikel und geben Sie eine strukturierte Ausgabe im JSON-Format.",
-            "fields": {
-                "claim_summary": "Eine kurze, neutrale Zusammenfassung der Hauptbehauptung (max 3 Sätze) - erklären Sie Abkürzungen und Fachbegriffe, einschließlich WARUM und WAS Kontext",
-                "critical_questions": "Kritische Fragen und Antworten aus dem Artikel",
-                "impact_summary": "Konkrete Auswirkungspunkte",
-                "sources": "Relevante Quellen"
-            },
-            "question_format": "Frage: Die erste kritische Frage | Antwort: Die Antwort aus dem Artikel",
-            "impact_format": "Auswirkungspunkt 1: kurze Beschreibung einer konkreten Auswirkung",
-            "language_instruction": "Verwenden Sie deutsche Sprache"
-        },
-        "es": {
-            "instruction": "Analiza el siguiente artículo de noticias y proporciona una salida estructurada en formato JSON.",
-            "fields": {
-                "claim_summary": "Un resumen breve y neutral de la afirmación principal (máx 3 oraciones) - explica abreviaciones y términos técnicos, incluyendo contexto de POR QUÉ y QUÉ",
-                "critical_questions": "Preguntas críticas y respuestas del artículo",
-                "impact_summary": "Puntos de impacto concretos",
-                "sources": "Fuentes relevantes"
-            },
-            "question_format": "Pregunta: La primera pregunta crítica | Respuesta: La respuesta del artículo",
-            "impact_format": "Punto de impacto 1: breve descripción de un impacto concreto",
-            "language_instruction": "Usa idioma español"
-        }
+    return {
+        "claim_summary": claim_summary,
+        "critical_questions": list(questions.values())[:max(len(previous["critical_questions"]), MAX_MERGED_ITEMS)],
+        "impact_summary": list(impacts.values())[:max(len(previous["impact_summary"]), MAX_MERGED_ITEMS)],
+        "sources": list(sources.values()),
     }
 
-    # Get language config, default to Dutch
-    lang_config = prompts.get(language, prompts["nl"])
-
-    # Create the prompt in the specified language
-    return f"""
-{lang_config['instruction']}
-
-Titel: {title}
-
-Tekst: {text}
-
-Geef de output in het volgende JSON formaat:
-{{
-    "claim_summary": "{lang_config['fields']['claim_summary']}",
-    "critical_questions": [
-        "{lang_config['question_format']}",
-        "Question/Vraag: Second critical question | Answer/Antwoord: Answer from article",
-        "Question/Vraag: Third critical question | Answer/Antwoord: Answer from article"
-    ],
-    "impact_summary": [
-        "{lang_config['impact_format']}",
-        "{lang_config['impact_format'].replace('1', '2')}",
-        "{lang_config['impact_format'].replace('1', '3')}"
-    ],
-    "sources": [
-        {{"title": "{lang_config['fields']['sources']} 1", "url": "https://example.com"}},
-        {{"title": "{lang_config['fields']['sources']} 2", "url": "https://example.com"}}
-    ]
-}}
-
-Instructies:
-1. Wees kritisch en objectief
-2. Focus op verificeerbare feiten en data
-3. Stel vragen die helpen bij fact-checking EN beantwoord ze met beschikbare info
-4. Impact punten moeten concreet en meetbaar zijn
-5. Bronnen moeten echt bestaan en relevant zijn
-6. {lang_config['language_instruction']}
-7. BELANGRIJK: Leg alle afkortingen, technische termen en jargon uit zodat een gewone lezer het begrijpt
-8. Framework voor complete context (ESSENTIEEL):
-   - Bij gebeurtenissen: leg uit WAT er precies is gebeurd
-   - Bij beslissingen: leg uit WAAROM deze beslissing is genomen
-   - Bij controverses: leg uit WAT er gezegd/gedaan is dat tot controverse leidde
-   - Bij sancties/straffen: leg uit het SPECIFIEKE gedrag dat tot de straf leidde
-   - Bij conflicten: leg uit de CONCRETE aanleiding en wat beide partijen beweren
-9. Framework voor vraag-antwoord (BELANGRIJK):
-   - Stel relevante kritische vragen die lezers zouden moeten hebben
-   - Beantwoord elke vraag zo volledig mogelijk met info uit het artikel
-   - Als exacte info niet beschikbaar is, geef context of aanverwante info uit het artikel
-   - Als echt geen relevante info in artikel staat, gebruik equivalent van 'Niet vermeld in artikel'
-   - Probeer altijd een bruikbaar antwoord te geven op basis van beschikbare context
-10. Antwoord ALLEEN met valide JSON, geen extra tekst
-11. BELANGRIJK: critical_questions moet een array van strings zijn, GEEN objecten!
-"""
+def interleave(lists) -> list:
+    lists = [list(items) for items in lists]
+    return [items[i] for i in range(max(map(len, lists), default=0)) for items in lists if i < len(items)]
+
+def stream_event(event: str, data, **extra) -> bytes:
+    return (json.dumps({"event": event, **extra, "data": data}, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def stream_analysis(request: AnalyzeRequest, article: PreparedArticle) -> AsyncIterator[bytes]:
+    """Events, in order: claim_summary, analysis, one question per enrichment as it finishes, done.
+
+    Streams for an article that is already being analyzed follow that analysis
+    from its first event. An error event replaces the rest of the stream if the
+    analysis fails.
+    """
+    cache_key = analysis_cache_key(request)
+    task = None
+    try:
+        seen = set()
+        result = lookup_analysis(request, article, cache_key)
+        if result is None:
+            events, created = analysis_log(cache_key)
+            task = asyncio.ensure_future(shared_analysis(request, article, cache_key, events, created))
+            async for event, data, extra in events.follow():
+                seen.add(event)
+                yield stream_event(event, data, **extra)
+            result = (await task).model_dump()
+
+        # Served from the cache, or by an analysis in another process
+        if "claim_summary" not in seen:
+            yield stream_event("claim_summary", result["claim_summary"])
+        if "analysis" not in seen:
+            yield stream_event("analysis", result)
+        yield stream_event("done", result)
+        ANALYSES.inc(endpoint="stream", outcome="ok")
+
+    except Exception as e:
+        ANALYSES.inc(endpoint="stream", outcome="error")
+        logger.exception("Streaming analysis failed for %s", request.url)
+        yield stream_event("error", f"Analysis failed: {str(e)}", status_code=getattr(e, "status_code", 500))
+    finally:
+        # A client that went away stops waiting; the shared analysis itself carries on
+        if task is not None and not task.done():
+            task.cancel()
+
+async def enhance_questions(questions: list, language: str, budget: "SearchBudget", events: EventLog) -> List[str]:
+    """Enrich unanswered questions concurrently, emitting each changed question as it is ready"""
+    questions = list(questions)
+
+    async def enhance_at(index: int, question):
+        return index, await enhance_question(question, language, budget)
+
+    for next_done in asyncio.as_completed([enhance_at(i, q) for i, q in enumerate(questions)]):
+        index, question = await next_done
+        if question != questions[index]:
+            questions[index] = question
+            events.emit("question", question, index=index)
+    return questions
+
+class SearchBudget:
+    """Per-analysis enrichment limits: concurrent searches and upstream searches in total.
+
+    degraded is set when a search was shed, failed or timed out, rather than
+    skipped by design, so the analysis would be better if run again later.
+    """
+
+    def __init__(self):
+        self.slots = asyncio.Semaphore(ENRICH_CONCURRENCY)
+        self.remaining = ENRICH_MAX_SEARCHES
+        self.degraded = False
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+async def enhance_question(question, language: str, budget: SearchBudget) -> str:
+    # Handle both string and dict format questions
+    if isinstance(question, dict):
+        # Convert dict format to our string format
+        vraag = question.get('vraag', '')
+        antwoord = question.get('antwoord', 'Niet vermeld in artikel')
+
+        # Check if this question needs web search enhancement
+        if "Niet vermeld in artikel" in antwoord:
+            logger.debug("Searching for dict question: %s", vraag)
+            search_result = await cached_search(vraag, language, budget)
+            if search_result and "Geen betrouwbare informatie gevonden" not in search_result and "tijdelijk niet beschikbaar" not in search_result:
+                logger.debug("Enhanced dict question with: %.100s", search_result)
+                return f"Vraag: {vraag} | Antwoord: {search_result}"
+        return f"Vraag: {vraag} | Antwoord: {antwoord}"
+
+    # Convert to string if needed
+    question_str = str(question)
+
+    # Check if the question needs enhancement
+    needs_enhancement = (
+        "Niet vermeld in artikel" in question_str or
+        "niet beantwoord" in question_str.lower() or
+        "geen informatie" in question_str.lower() or
+        "niet duidelijk" in question_str.lower()
+    )
+
+    if needs_enhancement and "Vraag:" in question_str:
+        # Extract the question part for search
+        question_part = question_str.split("|")[0].replace("Vraag:", "").strip()
+
+        # Search for additional context using Gemini with web search
+        logger.debug("Searching for: %s", question_part)
+        search_result = await cached_search(question_part, language, budget)
+
+        if search_result and "Geen betrouwbare informatie gevonden" not in search_result and "tijdelijk niet beschikbaar" not in search_result:
+            logger.debug("Enhanced question with: %.100s", search_result)
+            return f"Vraag: {question_part} | Antwoord: Online informatie: {search_result}"
+        # Keep original if search didn't help
+        logger.debug("No enhancement found for: %s", question_part)
+
+    # Keep questions that already have good answers
+    return question_str
+
+
+async def cached_search(query: str, language: str, budget: SearchBudget) -> str:
+    """Answer from the shared answer cache, or search once for all concurrent askers"""
+    key = question_key(query, language, PROMPT_VERSION)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Enrichment is optional: while Gemini is unhealthy, answer faster without it
+    if not gemini_client.governor.breaker.healthy():
+        budget.degraded = True
+        return SEARCH_UNAVAILABLE
+    # Checked before embedding, so an exhausted budget costs no upstream call at all
+    if budget.remaining <= 0:
+        return SEARCH_UNAVAILABLE
+
+    vector = None
+    if fuzzy_answers is not None:
+        try:
+            vector = unit_vector(await gemini_client.embed(query))
+        except UpstreamUnavailable:
+            logger.debug("Question embedding shed: %s", query)
+        except Exception as e:
+            logger.warning("Question embedding failed: %s", e)
+    if vector is not None:
+        # The scan is pure Python, so it runs off the event loop
+        match = await asyncio.to_thread(fuzzy_answers.find, language, vector)
+        cached = answer_cache.get(match[0]) if match else None
+        if cached is not None:
+            logger.debug("Paraphrase hit for %s (similarity %.2f)", query, match[1])
+            return cached
+
+    if not budget.take():
+        return SEARCH_UNAVAILABLE
+
+    async def search_and_store():
+        answer = await bounded_search(query, language, budget)
+        if answer != SEARCH_UNAVAILABLE:
+            answer_cache.set(key, answer)
+            if fuzzy_answers is not None:
+                fuzzy_answers.add(language, key, vector)
+        return answer
+
+    answer = await answer_flights.run(key, search_and_store)
+    if answer == SEARCH_UNAVAILABLE:
+        budget.degraded = True
+    return answer
+
+async def bounded_search(query: str, language: str, budget: SearchBudget) -> str:
+    async with budget.slots, enrichment_slots:
+        try:
+            with stage("search"):
+                return await asyncio.wait_for(search_web_with_gemini(query, language), ENRICH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Search timed out after %ss: %s", ENRICH_TIMEOUT, query)
+            return SEARCH_UNAVAILABLE
+
+def create_analysis_prompt(title: str, text: str, language: str = "nl") -> str:
+    return render_analysis_prompt(title, text, language)
 
 async def search_web_with_gemini(query: str, language: str = "nl") -> str:
     """Answer question using Gemini's knowledge base"""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-
-        # Language-specific search prompts
-        language_prompts = {
-            "nl": f"Beantwoord deze vraag zo volledig mogelijk: \"{query}\"\n\nGeef een informatief, feitelijk antwoord van maximaal 3 zinnen in het Nederlands. Focus op concrete feiten, cijfers, en praktische informatie. Formatteer je antwoord kort en bondig, zonder inleidende zinnen.",
-            "en": f"Answer this question as completely as possible: \"{query}\"\n\nProvide an informative, factual answer of maximum 3 sentences in English. Focus on concrete facts, figures, and practical information. Format your answer concisely, without introductory sentences.",
-            "de": f"Beantworten Sie diese Frage so vollständig wie möglich: \"{query}\"\n\nGeben Sie eine informative, sachliche Antwort von maximal 3 Sätzen auf Deutsch. Konzentrieren Sie sich auf konkrete Fakten, Zahlen und praktische Informationen. Formatieren Sie Ihre Antwort prägnant, ohne einleitende Sätze.",
-            "es": f"Responde a esta pregunta lo más completamente posible: \"{query}\"\n\nProporciona una respuesta informativa y fáctica de máximo 3 oraciones en español. Enfócate en hechos concretos, cifras e información práctica. Formatea tu respuesta de manera concisa, sin oraciones introductorias."
-        }
-
-        enhanced_prompt = language_prompts.get(language, language_prompts["nl"])
-
-        response = await asyncio.to_thread(
-            model.generate_content,
-            enhanced_prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=1500,
-                temperature=0.2
-            )
-        )
+        enhanced_prompt = render_search_prompt(query, language)
+
+        response = await gemini_client.generate(enhanced_prompt, max_output_tokens=1500, temperature=0.2, call="search", optional=True)
 
-        result = response.text.strip()
+        result = response.strip()
 
         # Clean up common unwanted phrases
         unwanted_phrases = [
@@ -306,127 +955,98 @@ async def search_web_with_gemini(query: str, language: str = "nl") -> str:
 
         return result if result and len(result) > 10 else "Meer onderzoek nodig voor een volledig antwoord"
 
+    except UpstreamUnavailable as e:
+        logger.debug("Search skipped: %s", e)
+        return SEARCH_UNAVAILABLE
     except Exception as e:
-        print(f"Gemini search error: {e}")
-        return "Informatie tijdelijk niet beschikbaar"
+        logger.warning("Gemini search error: %s", e)
+        return SEARCH_UNAVAILABLE
 
 async def call_gemini(prompt: str) -> str:
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-
-        full_prompt = f"""Je bent een kritische nieuwsanalist die helpt bij het verifiëren van claims en het identificeren van belangrijke vragen. Antwoord altijd in valide JSON formaat.
+    full_prompt = f"""{ANALYST_PREAMBLE}
 
 {prompt}"""
 
-        response = await asyncio.to_thread(
-            model.generate_content,
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=1500,
-                temperature=0.3
-            )
-        )
-
-        return response.text
-
-    except Exception as e:
-        raise Exception(f"Gemini API error: {str(e)}")
-
-def parse_gemini_response(response: str) -> dict:
-    try:
-        # Clean the response and extract JSON
-        response = response.strip()
-
-        # Remove markdown code blocks
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                response = response[start:end]
-        elif "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                response = response[start:end]
-
-        response = response.strip()
-
-        # Find JSON object boundaries
-        start_idx = response.find('{')
-        end_idx = response.rfind('}')
-
-        if start_idx != -1 and end_idx != -1:
-            response = response[start_idx:end_idx+1]
-
-        # Additional JSON cleaning for common issues
-        response = response.replace('\n', ' ')  # Remove newlines
-        response = response.replace('\t', ' ')  # Remove tabs
-
-        # Fix common JSON errors
-        # Remove trailing commas before closing brackets/braces
-        import re
-        response = re.sub(r',(\s*[}\]])', r'\1', response)
-
-        # Ensure proper quote escaping within strings
-        # This is a basic fix - for production use a proper JSON fixer
-
-        print(f"Cleaned JSON: {response[:300]}...")
-
+    attempt = 0
+    while True:
+        attempt += 1
         try:
-            analysis = json.loads(response)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            print(f"Problematic JSON around error: {response[max(0, e.pos-50):e.pos+50]}")
-
-            # Try multiple fixes
-            fixed_response = response
+            return await gemini_client.generate(full_prompt, max_output_tokens=1500, temperature=0.3)
+        except UpstreamUnavailable:
+            # Refused by our own governor; retrying would only add to the queue
+            raise
+        except Exception as e:
+            if not await retry_upstream(e, attempt):
+                raise upstream_error(e) from e
 
-            # Fix smart quotes
-            fixed_response = fixed_response.replace('"', '"').replace('"', '"')
-            fixed_response = fixed_response.replace(''', "'").replace(''', "'")
+async def call_gemini_stream(prompt: str) -> AsyncIterator[str]:
+    full_prompt = f"""{ANALYST_PREAMBLE}
 
-            # Fix problematic keys with | characters
-            fixed_response = fixed_response.replace('"| Antwoord":', '"antwoord":')
-            fixed_response = fixed_response.replace('"| antwoord":', '"antwoord":')
+{prompt}"""
 
-            # Try to fix malformed object in critical_questions array
-            import re
-            # Replace object format with string format in critical_questions
-            pattern = r'\{\s*"Vraag":\s*"([^"]*)",?\s*"[|]?\s*[Aa]ntwoord":\s*"([^"]*)"\s*\}'
-            fixed_response = re.sub(pattern, r'"Vraag: \1 | Antwoord: \2"', fixed_response)
+    attempt = 0
+    while True:
+        attempt += 1
+        started = False
+        try:
+            async for chunk in gemini_client.generate_stream(full_prompt, max_output_tokens=1500, temperature=0.3):
+                started = True
+                yield chunk
+            return
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            # Once text has been forwarded a retry would repeat it
+            if started or not await retry_upstream(e, attempt):
+                raise upstream_error(e) from e
+
+async def retry_upstream(error: Exception, attempt: int) -> bool:
+    """Sleep before the next attempt if the error is transient and retries are left"""
+    if attempt > GEMINI_RETRIES or not gemini_client.is_transient_error(error):
+        return False
+    delay = jobs.backoff_delay(attempt, base=0.5, cap=4.0)
+    logger.info("Gemini call failed (%s), retry %d in %.1fs", error, attempt, delay)
+    await asyncio.sleep(delay)
+    return True
+
+def upstream_error(error: Exception) -> Exception:
+    if gemini_client.is_transient_error(error):
+        return UpstreamUnavailable("Gemini is tijdelijk overbelast, probeer het zo opnieuw", retry_after=5.0)
+    return Exception(f"Gemini API error: {str(error)}")
 
-            try:
-                analysis = json.loads(fixed_response)
-            except json.JSONDecodeError:
-                # Last resort: try to extract just the basic structure
-                print("Attempting basic fallback structure")
-                analysis = {
-                    "claim_summary": "Kon JSON niet verwerken - probeer opnieuw",
-                    "critical_questions": ["Fout bij verwerken van vragen"],
-                    "impact_summary": ["Fout bij verwerken van impact"],
-                    "sources": []
-                }
-
-        # Validate required fields
-        required_fields = ["claim_summary", "critical_questions", "impact_summary", "sources"]
-        for field in required_fields:
-            if field not in analysis:
-                raise ValueError(f"Missing required field: {field}")
+def parse_gemini_response(response: str) -> dict:
+    try:
+        analysis = extract_json(response)
+    except ValueError as e:
+        logger.warning("JSON parse error: %s", e)
+        analysis = None
+    return normalize_analysis(analysis)
+
+def normalize_analysis(analysis) -> dict:
+    """Validate parsed model output and coerce it into the AnalyzeResponse shape"""
+    try:
+        PARSE_RESULTS.inc(outcome="ok" if isinstance(analysis, dict) else "fallback")
+        if not isinstance(analysis, dict):
+            # Last resort: return the basic structure
+            logger.warning("Attempting basic fallback structure")
+            analysis = {
+                "claim_summary": "Kon JSON niet verwerken - probeer opnieuw",
+                "critical_questions": ["Fout bij verwerken van vragen"],
+                "impact_summary": ["Fout bij verwerken van impact"],
+                "sources": [],
+                # Not model output: run_analysis reports it so the result is not cached
+                "fallback": True,
+            }
+
+        # Validate required fields; list fields lost to a truncated response get defaults below
+        if "claim_summary" not in analysis:
+            raise ValueError("Missing required field: claim_summary")
+        for field in ["critical_questions", "impact_summary", "sources"]:
+            analysis.setdefault(field, [])
 
         # Fix critical_questions format if needed
         if isinstance(analysis["critical_questions"], list):
-            fixed_questions = []
-            for question in analysis["critical_questions"]:
-                if isinstance(question, dict):
-                    # Convert object format to string format
-                    vraag = question.get('Vraag', question.get('vraag', 'Onbekende vraag'))
-                    antwoord = question.get('Antwoord', question.get('antwoord', question.get('| Antwoord', 'Geen antwoord')))
-                    fixed_questions.append(f"Vraag: {vraag} | Antwoord: {antwoord}")
-                elif isinstance(question, str):
-                    fixed_questions.append(question)
-                else:
-                    fixed_questions.append("Vraag: Onbekende vraag | Antwoord: Geen antwoord")
-            analysis["critical_questions"] = fixed_questions
+            analysis["critical_questions"] = format_questions(analysis["critical_questions"])
 
         # Ensure lists have content
         if not isinstance(analysis["critical_questions"], list) or len(analysis["critical_questions"]) == 0:
@@ -440,11 +1060,25 @@ def parse_gemini_response(response: str) -> dict:
 
         return analysis
 
-    except json.JSONDecodeError as e:
-        raise Exception(f"Failed to parse Gemini response as JSON: {str(e)}")
     except Exception as e:
         raise Exception(f"Error processing analysis: {str(e)}")
 
+def format_questions(questions) -> List[str]:
+    """Critical questions as "Vraag: .. | Antwoord: .." strings, whatever shape the model used"""
+    fixed_questions = []
+    for question in questions if isinstance(questions, list) else []:
+        if isinstance(question, dict):
+            # Convert object format ({"Vraag": .., "| Antwoord": ..} and variants) to string format
+            fields = {str(key).strip("| ").lower(): value for key, value in question.items()}
+            vraag = fields.get('vraag', fields.get('question', 'Onbekende vraag'))
+            antwoord = fields.get('antwoord', fields.get('answer', 'Geen antwoord'))
+            fixed_questions.append(f"Vraag: {vraag} | Antwoord: {antwoord}")
+        elif isinstance(question, str):
+            fixed_questions.append(question)
+        else:
+            fixed_questions.append("Vraag: Onbekende vraag | Antwoord: Geen antwoord")
+    return fixed_questions
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -459,7 +1093,3 @@ async def debug_check():
         "gemini_key_length": len(os.getenv("GEMINI_API_KEY", "")),
         "environment": "cloud_run"
     }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,196 @@
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# One-permutation MinHash: every shingle hash lands in one of SIGNATURE_SIZE bins and each
+# bin keeps its minimum. LSH splits the signature into BANDS bands of ROWS values; two
+# articles become candidates when any band matches exactly. With 16 bands of 8 rows,
+# pairs at 0.8 similarity are found ~95% of the time and pairs below 0.5 almost never.
+SIGNATURE_SIZE = 128
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+SHINGLE_WORDS = 5
+# Fewer shingles than this says too little about an article to match it
+MIN_SHINGLES = 20
+
+_BIN_SHIFT = 64 - (SIGNATURE_SIZE - 1).bit_length()
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_EMPTY = _MASK64
+_WORD = re.compile(r"\w+")
+
+
+def signature(text: str) -> Optional[array]:
+    """MinHash signature over word shingles, or None for texts too short to compare"""
+    words = _WORD.findall(text.lower())
+    if len(words) - SHINGLE_WORDS + 1 < MIN_SHINGLES:
+        return None
+    sig = [_EMPTY] * SIGNATURE_SIZE
+    for start in range(len(words) - SHINGLE_WORDS + 1):
+        # crc32 is stable across processes (str hash is not), the multiply spreads it over 64 bits
+        h = (zlib.crc32(" ".join(words[start:start + SHINGLE_WORDS]).encode("utf-8")) * _GOLDEN) & _MASK64
+        index = h >> _BIN_SHIFT
+        value = h & _VALUE_MASK
+        if value < sig[index]:
+            sig[index] = value
+    # Fill empty bins from the next filled one, offset by distance so they don't all agree
+    for index in range(SIGNATURE_SIZE):
+        if sig[index] == _EMPTY:
+            for distance in range(1, SIGNATURE_SIZE):
+                value = sig[(index + distance) % SIGNATURE_SIZE]
+                if value != _EMPTY and value <= _VALUE_MASK:
+                    sig[index] = value + (distance << _BIN_SHIFT)
+                    break
+    # 32 bits per bin is plenty to tell values apart and halves the memory per entry
+    return array("I", [(value ^ (value >> 32)) & 0xFFFFFFFF for value in sig])
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_SIZE
+
+
+class NearDuplicateIndex:
+    """LSH index from article signatures to analysis cache keys.
+
+    Entries are grouped by namespace (language and prompt version) so an
+    analysis is only ever reused under the same prompt. The oldest entries are
+    dropped beyond max_entries. With db_path the signatures are kept in SQLite,
+    the in-memory index is rebuilt from it on start and entries added by other
+    processes sharing the file are picked up every SYNC_INTERVAL seconds.
+    """
+
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 200000, db_path: Optional[str] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # entry id -> (namespace, analysis cache key, signature), oldest first
+        self._entries: "OrderedDict[int, Tuple[str, str, array]]" = OrderedDict()
+        # band hash -> entry id, or a list of ids for the rare shared bucket
+        self._buckets: Dict[int, object] = {}
+        self._ids: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._synced_until = 0.0
+        self._synced_at = 0.0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS neardup (key TEXT PRIMARY KEY, namespace TEXT NOT NULL, signature BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS neardup_created ON neardup (created_at)")
+            rows = self._db.execute(
+                "SELECT namespace, key, signature, created_at FROM neardup ORDER BY created_at DESC LIMIT ?", (max_entries,)
+            ).fetchall()
+            self._load(reversed(rows))
+
+    def find(self, namespace: str, sig: Optional[array]) -> Optional[Tuple[str, float]]:
+        """Cache key and similarity of the closest indexed article at or above the threshold"""
+        if sig is None or self.max_entries <= 0:
+            return None
+        best = None
+        with self._lock:
+            if self._db is not None and time.monotonic() - self._synced_at >= self.SYNC_INTERVAL:
+                self._load(self._db.execute(
+                    "SELECT namespace, key, signature, created_at FROM neardup WHERE created_at >= ? ORDER BY created_at",
+                    (self._synced_until,),
+                ))
+            seen = set()
+            for band_key in _band_keys(namespace, sig):
+                bucket = self._buckets.get(band_key)
+                if bucket is None:
+                    continue
+                for entry_id in bucket if isinstance(bucket, list) else (bucket,):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    entry_namespace, key, other = self._entries[entry_id]
+                    if entry_namespace != namespace:
+                        continue
+                    score = similarity(sig, other)
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (key, score)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def add(self, namespace: str, key: str, sig: Optional[array]) -> None:
+        if sig is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            # Same key, same content: re-analyses after cache expiry need no new entry
+            if key in self._ids:
+                return
+            self._insert(namespace, key, sig)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO neardup (key, namespace, signature, created_at) VALUES (?, ?, ?, ?)",
+                    (key, namespace, sig.tobytes(), time.time()),
+                )
+
+    def _load(self, rows) -> None:
+        for namespace, key, blob, created_at in rows:
+            if key not in self._ids:
+                self._insert(namespace, key, array("I", blob))
+            self._synced_until = max(self._synced_until, created_at)
+        self._synced_at = time.monotonic()
+
+    def _insert(self, namespace: str, key: str, sig: array) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (namespace, key, sig)
+        self._ids[key] = entry_id
+        for band_key in _band_keys(namespace, sig):
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                self._buckets[band_key] = entry_id
+            elif isinstance(bucket, list):
+                bucket.append(entry_id)
+            else:
+                self._buckets[band_key] = [bucket, entry_id]
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, (namespace, key, sig) = self._entries.popitem(last=False)
+        del self._ids[key]
+        for band_key in _band_keys(namespace, sig):
+            bucket = self._buckets.get(band_key)
+            if bucket == entry_id:
+                del self._buckets[band_key]
+            elif isinstance(bucket, list) and entry_id in bucket:
+                bucket.remove(entry_id)
+                if len(bucket) == 1:
+                    self._buckets[band_key] = bucket[0]
+        if self._db is not None:
+            self._db.execute("DELETE FROM neardup WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+
+def _band_keys(namespace: str, sig: array) -> List[int]:
+    return [hash((namespace, band, sig[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
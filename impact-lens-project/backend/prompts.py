@@ -0,0 +1,215 @@
+import hashlib
+from typing import Dict, Tuple
+
+# Bump when a change in how responses are handled should invalidate cached analyses;
+# edits to the prompt text itself already change PROMPT_VERSION through the digest
+PROMPT_REVISION = "2"
+
+ANALYST_PREAMBLE = "Je bent een kritische nieuwsanalist die helpt bij het verifiëren van claims en het identificeren van belangrijke vragen. Antwoord altijd in valide JSON formaat."
+
+# Language-specific prompts and instructions
+ANALYSIS_LANGUAGES = {
+    "nl": {
+        "instruction": "Analyseer het volgende nieuwsartikel en geef een gestructureerde output in JSON formaat.",
+        "fields": {
+            "claim_summary": "Een korte, neutrale samenvatting van de hoofdclaim (max 3 zinnen) - leg afkortingen en technische termen uit, inclusief WHY en WHAT context",
+            "critical_questions": "Kritische vragen en antwoorden uit het artikel",
+            "impact_summary": "Concrete impact punten",
+            "sources": "Relevante bronnen"
+        },
+        "question_format": "Vraag: De eerste kritische vraag | Antwoord: Het antwoord uit het artikel",
+        "impact_format": "Impact punt 1: korte beschrijving van een concrete impact",
+        "language_instruction": "Gebruik Nederlandse taal"
+    },
+    "en": {
+        "instruction": "Analyze the following news article and provide a structured output in JSON format.",
+        "fields": {
+            "claim_summary": "A brief, neutral summary of the main claim (max 3 sentences) - explain abbreviations and technical terms, including WHY and WHAT context",
+            "critical_questions": "Critical questions and answers from the article",
+            "impact_summary": "Concrete impact points",
+            "sources": "Relevant sources"
+        },
+        "question_format": "Question: The first critical question | Answer: The answer from the article",
+        "impact_format": "Impact point 1: brief description of a concrete impact",
+        "language_instruction": "Use English language"
+    },
+    "de": {
+        "instruction": "Analysieren Sie den folgenden Nachrichtenartikel und geben Sie eine strukturierte Ausgabe im JSON-Format.",
+        "fields": {
+            "claim_summary": "Eine kurze, neutrale Zusammenfassung der Hauptbehauptung (max 3 Sätze) - erklären Sie Abkürzungen und Fachbegriffe, einschließlich WARUM und WAS Kontext",
+            "critical_questions": "Kritische Fragen und Antworten aus dem Artikel",
+            "impact_summary": "Konkrete Auswirkungspunkte",
+            "sources": "Relevante Quellen"
+        },
+        "question_format": "Frage: Die erste kritische Frage | Antwort: Die Antwort aus dem Artikel",
+        "impact_format": "Auswirkungspunkt 1: kurze Beschreibung einer konkreten Auswirkung",
+        "language_instruction": "Verwenden Sie deutsche Sprache"
+    },
+    "es": {
+        "instruction": "Analiza el siguiente artículo de noticias y proporciona una salida estructurada en formato JSON.",
+        "fields": {
+            "claim_summary": "Un resumen breve y neutral de la afirmación principal (máx 3 oraciones) - explica abreviaciones y términos técnicos, incluyendo contexto de POR QUÉ y QUÉ",
+            "critical_questions": "Preguntas críticas y respuestas del artículo",
+            "impact_summary": "Puntos de impacto concretos",
+            "sources": "Fuentes relevantes"
+        },
+        "question_format": "Pregunta: La primera pregunta crítica | Respuesta: La respuesta del artículo",
+        "impact_format": "Punto de impacto 1: breve descripción de un impacto concreto",
+        "language_instruction": "Usa idioma español"
+    }
+}
+
+# Placeholders that are swapped for the request values at render time
+_TITLE = "\x00TITLE\x00"
+_TEXT = "\x00TEXT\x00"
+_QUERY = "\x00QUERY\x00"
+_PREVIOUS = "\x00PREVIOUS\x00"
+
+
+def _analysis_template(lang_config: dict) -> str:
+    return f"""
+{lang_config['instruction']}
+
+Titel: {_TITLE}
+
+Tekst: {_TEXT}
+
+Geef de output in het volgende JSON formaat:
+{{
+    "claim_summary": "{lang_config['fields']['claim_summary']}",
+    "critical_questions": [
+        "{lang_config['question_format']}",
+        "Question/Vraag: Second critical question | Answer/Antwoord: Answer from article",
+        "Question/Vraag: Third critical question | Answer/Antwoord: Answer from article"
+    ],
+    "impact_summary": [
+        "{lang_config['impact_format']}",
+        "{lang_config['impact_format'].replace('1', '2')}",
+        "{lang_config['impact_format'].replace('1', '3')}"
+    ],
+    "sources": [
+        {{"title": "{lang_config['fields']['sources']} 1", "url": "https://example.com"}},
+        {{"title": "{lang_config['fields']['sources']} 2", "url": "https://example.com"}}
+    ]
+}}
+
+Instructies:
+1. Wees kritisch en objectief
+2. Focus op verificeerbare feiten en data
+3. Stel vragen die helpen bij fact-checking EN beantwoord ze met beschikbare info
+4. Impact punten moeten concreet en meetbaar zijn
+5. Bronnen moeten echt bestaan en relevant zijn
+6. {lang_config['language_instruction']}
+7. BELANGRIJK: Leg alle afkortingen, technische termen en jargon uit zodat een gewone lezer het begrijpt
+8. Framework voor complete context (ESSENTIEEL):
+   - Bij gebeurtenissen: leg uit WAT er precies is gebeurd
+   - Bij beslissingen: leg uit WAAROM deze beslissing is genomen
+   - Bij controverses: leg uit WAT er gezegd/gedaan is dat tot controverse leidde
+   - Bij sancties/straffen: leg uit het SPECIFIEKE gedrag dat tot de straf leidde
+   - Bij conflicten: leg uit de CONCRETE aanleiding en wat beide partijen beweren
+9. Framework voor vraag-antwoord (BELANGRIJK):
+   - Stel relevante kritische vragen die lezers zouden moeten hebben
+   - Beantwoord elke vraag zo volledig mogelijk met info uit het artikel
+   - Als exacte info niet beschikbaar is, geef context of aanverwante info uit het artikel
+   - Als echt geen relevante info in artikel staat, gebruik equivalent van 'Niet vermeld in artikel'
+   - Probeer altijd een bruikbaar antwoord te geven op basis van beschikbare context
+10. Antwoord ALLEEN met valide JSON, geen extra tekst
+11. BELANGRIJK: critical_questions moet een array van strings zijn, GEEN objecten!
+"""
+
+
+def _update_template(lang_config: dict) -> str:
+    return f"""
+{lang_config['instruction']}
+Dit artikel is eerder geanalyseerd en sindsdien bijgewerkt. Je krijgt de vorige analyse en ALLEEN de nieuwe of gewijzigde passages.
+
+Titel: {_TITLE}
+
+Vorige analyse: {_PREVIOUS}
+
+Nieuwe of gewijzigde passages: {_TEXT}
+
+Geef de output in het volgende JSON formaat:
+{{
+    "claim_summary": "{lang_config['fields']['claim_summary']}",
+    "critical_questions": [
+        "{lang_config['question_format']}"
+    ],
+    "impact_summary": [
+        "{lang_config['impact_format']}"
+    ],
+    "sources": [
+        {{"title": "{lang_config['fields']['sources']} 1", "url": "https://example.com"}}
+    ]
+}}
+
+Instructies:
+1. claim_summary: geef de volledige, bijgewerkte samenvatting van het hele artikel; neem de vorige over als de nieuwe passages de hoofdclaim niet veranderen
+2. critical_questions: ALLEEN vragen die de nieuwe passages oproepen, of vorige vragen waarvan het antwoord door de nieuwe passages verandert (met exact dezelfde vraagtekst als in de vorige analyse)
+3. impact_summary: ALLEEN nieuwe of gewijzigde impact punten
+4. sources: ALLEEN nieuwe bronnen
+5. Lege arrays zijn toegestaan als de nieuwe passages niets toevoegen
+6. {lang_config['language_instruction']}
+7. BELANGRIJK: Leg alle afkortingen, technische termen en jargon uit zodat een gewone lezer het begrijpt
+8. Beantwoord elke vraag zo volledig mogelijk met info uit de passages of de vorige analyse; gebruik anders het equivalent van 'Niet vermeld in artikel'
+9. Antwoord ALLEEN met valide JSON, geen extra tekst
+10. BELANGRIJK: critical_questions moet een array van strings zijn, GEEN objecten!
+"""
+
+
+SEARCH_TEMPLATES = {
+    "nl": "Beantwoord deze vraag zo volledig mogelijk: \"" + _QUERY + "\"\n\nGeef een informatief, feitelijk antwoord van maximaal 3 zinnen in het Nederlands. Focus op concrete feiten, cijfers, en praktische informatie. Formatteer je antwoord kort en bondig, zonder inleidende zinnen.",
+    "en": "Answer this question as completely as possible: \"" + _QUERY + "\"\n\nProvide an informative, factual answer of maximum 3 sentences in English. Focus on concrete facts, figures, and practical information. Format your answer concisely, without introductory sentences.",
+    "de": "Beantworten Sie diese Frage so vollständig wie möglich: \"" + _QUERY + "\"\n\nGeben Sie eine informative, sachliche Antwort von maximal 3 Sätzen auf Deutsch. Konzentrieren Sie sich auf konkrete Fakten, Zahlen und praktische Informationen. Formatieren Sie Ihre Antwort prägnant, ohne einleitende Sätze.",
+    "es": "Responde a esta pregunta lo más completamente posible: \"" + _QUERY + "\"\n\nProporciona una respuesta informativa y fáctica de máximo 3 oraciones en español. Enfócate en hechos concretos, cifras e información práctica. Formatea tu respuesta de manera concisa, sin oraciones introductorias."
+}
+
+
+def _split(template: str, *placeholders: str) -> Tuple[str, ...]:
+    parts = []
+    for placeholder in placeholders:
+        head, template = template.split(placeholder)
+        parts.append(head)
+    parts.append(template)
+    return tuple(parts)
+
+
+# Rendered once at import: static text around the per-request values, per language
+ANALYSIS_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    language: _split(_analysis_template(lang_config), _TITLE, _TEXT)
+    for language, lang_config in ANALYSIS_LANGUAGES.items()
+}
+UPDATE_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    language: _split(_update_template(lang_config), _TITLE, _PREVIOUS, _TEXT)
+    for language, lang_config in ANALYSIS_LANGUAGES.items()
+}
+SEARCH_PROMPTS: Dict[str, Tuple[str, ...]] = {
+    language: _split(template, _QUERY) for language, template in SEARCH_TEMPLATES.items()
+}
+
+# Identifies the exact prompts in use, so caches never serve output from other prompts
+PROMPT_VERSION = PROMPT_REVISION + "-" + hashlib.sha256(
+    "\x00".join(
+        [ANALYST_PREAMBLE]
+        + ["".join(parts) for _, parts in sorted(ANALYSIS_TEMPLATES.items())]
+        + ["".join(parts) for _, parts in sorted(UPDATE_TEMPLATES.items())]
+        + ["".join(parts) for _, parts in sorted(SEARCH_PROMPTS.items())]
+    ).encode("utf-8")
+).hexdigest()[:12]
+
+
+def render_analysis_prompt(title: str, text: str, language: str = "nl") -> str:
+    # Unknown languages fall back to Dutch
+    head, middle, tail = ANALYSIS_TEMPLATES.get(language) or ANALYSIS_TEMPLATES["nl"]
+    return "".join((head, title, middle, text, tail))
+
+
+def render_update_prompt(title: str, previous: str, text: str, language: str = "nl") -> str:
+    """Prompt to update a previous analysis (as JSON) with only the changed passages of the article"""
+    head, after_title, after_previous, tail = UPDATE_TEMPLATES.get(language) or UPDATE_TEMPLATES["nl"]
+    return "".join((head, title, after_title, previous, after_previous, text, tail))
+
+
+def render_search_prompt(query: str, language: str = "nl") -> str:
+    head, tail = SEARCH_PROMPTS.get(language) or SEARCH_PROMPTS["nl"]
+    return "".join((head, query, tail))
@@ -0,0 +1,43 @@
+"""Production launcher: python serve.py
+
+Kept apart from main.py so the app module is only imported by uvicorn, once per
+worker. Running main.py as a script would execute it a second time as __main__,
+with its own caches, job queue and metric registrations.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds to finish in-flight work after SIGTERM (Cloud Run allows 10). Uvicorn first waits
+# for open requests, then the lifespan drains analyses nobody awaits anymore and running jobs;
+# the two phases split the budget so together they stay within it
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "8"))
+REQUEST_GRACE_SECONDS = int(SHUTDOWN_TIMEOUT // 2)
+
+
+def main():
+    import uvicorn
+
+    # WEB_CONCURRENCY worker processes on PORT. One by default: a worker takes about
+    # 110 MB and the Cloud Run service (cloudbuild.yaml) has 512 MiB and one CPU
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    # Spawned workers read it to take their share of the Gemini quota
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if workers > 1:
+        # Workers share analyses, answers, revisions, the near-duplicate index and leases through one SQLite file
+        shared_db = os.getenv("SHARED_STATE_DB", "shared_state.db")
+        for name in ("ANALYSIS_CACHE_DB", "ANSWER_CACHE_DB", "NEARDUP_DB", "ARTICLE_REVISION_DB"):
+            os.environ.setdefault(name, shared_db)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        timeout_graceful_shutdown=REQUEST_GRACE_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cache hit up to a slow chain of model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # A second registration would repeat the family in the exposition, which Prometheus rejects
+        if any(metric.name == name for metric in REGISTRY):
+            raise ValueError(f"Metric {name} is already registered")
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Callback(Metric):
+    """A gauge or counter whose values are read from existing state at scrape time"""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Dict[Tuple[str, ...], float]], labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._read().items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: bucket counts (non-cumulative, +Inf last), sum, count
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(self.labelnames, labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            series = sorted((key, [list(counts), total, count]) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+STAGE_SECONDS = Histogram(
+    "impactlens_stage_seconds",
+    "Time spent per analysis stage",
+    ["stage"],
+)
+UPSTREAM_SECONDS = Histogram(
+    "impactlens_upstream_seconds",
+    "Latency of Gemini calls",
+    ["call", "outcome"],
+)
+UPSTREAM_TOKENS = Histogram(
+    "impactlens_upstream_tokens",
+    "Tokens per Gemini call (estimated when the API does not report usage)",
+    ["call", "direction"],
+    buckets=TOKEN_BUCKETS,
+)
+UPSTREAM_REJECTIONS = Counter(
+    "impactlens_upstream_rejections_total",
+    "Gemini calls not made because of the rate limit or an open circuit",
+    ["call", "reason"],
+)
+PARSE_RESULTS = Counter(
+    "impactlens_parse_results_total",
+    "Model responses by parse outcome (ok, fallback)",
+    ["outcome"],
+)
+INCREMENTAL_UPDATES = Counter(
+    "impactlens_incremental_updates_total",
+    "Re-analyses of a previously analyzed URL by outcome (updated, unchanged, full, fallback)",
+    ["outcome"],
+)
+ANALYSES = Counter(
+    "impactlens_analyses_total",
+    "Analysis requests by endpoint and outcome",
+    ["endpoint", "outcome"],
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into impactlens_stage_seconds, whether it succeeds or not"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# One random draw per request, so its DEBUG records are kept or dropped together
+_request_draw: ContextVar[Optional[float]] = ContextVar("impactlens_request_draw", default=None)
+
+
+def sample_request() -> None:
+    """Decide whether the DEBUG records of the current request (and tasks it starts) are logged"""
+    _request_draw.set(random.random())
+
+
+class SamplingFilter(logging.Filter):
+    """Pass only a fraction of DEBUG records so per-request detail stays affordable in production.
+
+    Inside a request the decision is made once by sample_request(); records
+    logged outside one are sampled individually.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        draw = _request_draw.get()
+        return (random.random() if draw is None else draw) < self.rate
+
+
+def configure_logging(level: Optional[str] = None, sample_rate: Optional[float] = None) -> logging.Logger:
+    """Set up the impactlens logger from LOG_LEVEL and LOG_SAMPLE_RATE"""
+    logger = logging.getLogger("impactlens")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handler.addFilter(SamplingFilter(float(sample_rate if sample_rate is not None else os.getenv("LOG_SAMPLE_RATE", "0.01"))))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    return logger
@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import EventLog, SingleFlight, TTLCache, content_key, normalize_question, question_key
+
+
+def test_content_key_ignores_presentation_differences():
+    key = content_key("https://Nieuws.nl/artikel/#reacties", "De  titel", "Tekst\nvan het artikel", "NL", "v1")
+    assert key == content_key("https://nieuws.nl/artikel", "De titel", "Tekst van het artikel", "nl", "v1")
+    assert key != content_key("https://nieuws.nl/artikel", "De titel", "Tekst van het artikel", "nl", "v2")
+
+
+def test_question_variants_share_a_key():
+    assert normalize_question("Vraag: Wat kost het plan?") == "wat kost het plan"
+    assert question_key("Wat kost het plan?", "nl", "v1") == question_key("wat  kost het PLAN", "NL", "v1")
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=10)
+    assert cache.get("a") == 1
+    now[0] += 11
+    assert cache.get("b") is None
+    cache.set("c", 3)
+    cache.set("d", 4)
+    assert cache.get("a") is None and cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    TTLCache(db_path=db_path, table="analyses").set("key", {"claim_summary": "x"})
+    restarted = TTLCache(db_path=db_path, table="analyses")
+    assert restarted.get("key") == {"claim_summary": "x"}
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_ttl_cache_entry_carries_its_own_expiry(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = TTLCache(ttl=3600, db_path=db_path)
+    cache.set("short", "x", ttl=120)
+    expires_at, value = cache.get_entry("short")
+    assert value == "x" and expires_at - time.time() <= 120
+    assert TTLCache(db_path=db_path).get_entry("short")[0] == expires_at
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resultaat"
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["resultaat"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_exceptions():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream")
+
+    async def main():
+        return await asyncio.gather(*(flights.run("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "resultaat"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("key", work))
+        second = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "resultaat"
+
+
+def test_single_flight_drain_waits_for_orphaned_work():
+    flights = SingleFlight()
+    done = []
+
+    async def work(seconds):
+        await asyncio.sleep(seconds)
+        done.append(seconds)
+
+    async def main():
+        for key, seconds in (("fast", 0.01), ("slow", 10)):
+            caller = asyncio.ensure_future(flights.run(key, lambda seconds=seconds: work(seconds)))
+            await asyncio.sleep(0)
+            caller.cancel()
+        return await flights.drain(0.1)
+
+    assert asyncio.run(main()) == 1
+    assert done == [0.01]
+
+
+def test_event_log_replays_to_late_followers():
+    async def main():
+        log = EventLog()
+        log.emit("claim_summary", "De rente daalt")
+        received = []
+
+        async def follow():
+            async for event, data, extra in log.follow():
+                received.append((event, data, extra))
+
+        follower = asyncio.ensure_future(follow())
+        await asyncio.sleep(0)
+        log.emit("question", "Vraag: x", index=0)
+        log.close()
+        await follower
+        return received
+
+    assert asyncio.run(main()) == [
+        ("claim_summary", "De rente daalt", {}),
+        ("question", "Vraag: x", {"index": 0}),
+    ]
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import governor
+from governor import CircuitBreaker, CircuitOpen, RateLimited, TokenBucket, UpstreamGovernor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(governor.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_reserves_and_refills(clock):
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60, max_wait=0) == 0
+    # Empty now: one more token takes a second at 60 per minute
+    assert bucket.reserve(1, max_wait=0) is None
+    assert bucket.reserve(1, max_wait=5) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.available() == pytest.approx(29)
+
+
+def test_bucket_refund_is_capped(clock):
+    bucket = TokenBucket(10)
+    bucket.reserve(4, max_wait=0)
+    bucket.refund(100)
+    assert bucket.available() == 10
+
+
+def test_oversized_call_fits_a_full_bucket(clock):
+    bucket = TokenBucket(100)
+    assert bucket.reserve(1000, max_wait=0) == 0
+    assert bucket.available() == 0
+
+
+def test_breaker_opens_and_probes_once(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.healthy() and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() == pytest.approx(10)
+
+
+def test_cancelled_probe_lets_another_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.cancel_probe()
+    assert breaker.allow()
+
+
+def test_optional_calls_are_shed_while_unhealthy(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    gov = UpstreamGovernor(60, 100000, breaker)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        asyncio.run(gov.admit(10, optional=True))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(gov.admit(10))
+
+
+def test_optional_calls_never_wait(clock):
+    gov = UpstreamGovernor(60, 1000, CircuitBreaker())
+    asyncio.run(gov.admit(1000))
+    with pytest.raises(RateLimited) as excinfo:
+        asyncio.run(gov.admit(10, optional=True))
+    assert excinfo.value.status_code == 429
+    # The request slot taken before the token budget ran out is given back
+    assert gov.requests.available() == pytest.approx(59)
+
+
+def test_main_calls_wait_for_budget(clock, monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(governor.asyncio, "sleep", sleep)
+    gov = UpstreamGovernor(60, 600, CircuitBreaker(), max_queue_wait=10)
+    asyncio.run(gov.admit(600))
+    asyncio.run(gov.admit(50))
+    assert slept == [pytest.approx(5.0)]
+    with pytest.raises(RateLimited):
+        asyncio.run(gov.admit(600))
@@ -0,0 +1,64 @@
+import time
+
+import jobs
+from jobs import JobQueue
+
+
+def test_claims_most_urgent_due_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    bulk = queue.submit({"n": 1}, priority="bulk")
+    premium = queue.submit({"n": 2}, priority="premium")
+    assert queue.claim()["id"] == premium
+    job = queue.claim()
+    assert job["id"] == bulk and job["attempts"] == 1
+    assert queue.claim() is None
+
+
+def test_retry_waits_until_due(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.submit({})
+    queue.retry(queue.claim()["id"], "429", delay=60)
+    assert queue.claim() is None
+    assert 0 < queue.next_due_in() <= 60
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_finished_jobs_are_purged_after_retention(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), retention=3600)
+    done = queue.submit({})
+    queue.complete(queue.claim()["id"], {"claim_summary": "x"})
+    failed = queue.submit({})
+    queue.fail(queue.claim()["id"], "kapot")
+    waiting = queue.submit({})
+
+    assert queue.purge() == 0
+    later = time.time() + 3601
+    monkeypatch.setattr(jobs.time, "time", lambda: later)
+    assert queue.purge() == 2
+    assert queue.get(done) is None and queue.get(failed) is None
+    assert queue.get(waiting)["status"] == "queued"
+
+
+def test_claim_purges_at_most_once_per_interval(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), retention=1)
+    purge = queue.purge
+    purges = []
+
+    def counting_purge():
+        purges.append(1)
+        return purge()
+
+    monkeypatch.setattr(queue, "purge", counting_purge)
+    queue.claim()
+    queue.claim()
+    assert len(purges) == 1
+
+
+def test_zero_retention_keeps_jobs(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), retention=0)
+    job_id = queue.submit({})
+    queue.complete(queue.claim()["id"], {})
+    later = time.time() + 10 * 365 * 24 * 3600
+    monkeypatch.setattr(jobs.time, "time", lambda: later)
+    assert queue.purge() == 0
+    assert queue.get(job_id)["status"] == "done"
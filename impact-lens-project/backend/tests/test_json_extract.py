@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+from json_extract import JsonExtractor, extract_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "corpus")
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1, "b": ["x"]}', {"a": 1, "b": ["x"]}),
+        ('Hier is de analyse:\n```json\n{"a": 1}\n```\nSucces!', {"a": 1}),
+        ('{"a": [1, 2,], "b": {"c": "d",},}', {"a": [1, 2], "b": {"c": "d"}}),
+        ('{“a”: “b”, “c”: [„d”]}', {"a": "b", "c": ["d"]}),
+        ('{"a": "Hij zei "nee" tegen de pers", "b": 1}', {"a": 'Hij zei "nee" tegen de pers', "b": 1}),
+        ('{"a": "regel 1\nregel 2\tmet tab"}', {"a": "regel 1\nregel 2\tmet tab"}),
+        ('{"a": "x"\n"b": ["y"\n "z"]}', {"a": "x", "b": ["y", "z"]}),
+        ('{"a": ["x", "y"}, "b": 1}', {"a": ["x", "y"], "b": 1}),
+        ('{"a": "volledig", "b": ["x", "onvolle', {"a": "volledig", "b": ["x", "onvolle"]}),
+        ('Hier is de analyse {zie hieronder}:\n```json\n{"a": [1], "b": "c"}\n```', {"a": [1], "b": "c"}),
+        ('Zie {"voorbeeld": 1}:\n```json\n{"a": 1,}\n```\nKlaar }', {"a": 1}),
+    ],
+    ids=["clean", "prose_and_fence", "trailing_commas", "smart_quotes", "unescaped_quotes",
+         "raw_control_characters", "missing_commas", "mismatched_brackets", "truncated",
+         "brace_in_prose", "object_in_fence_preferred"],
+)
+def test_extract_json_repairs(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_escapes_are_kept():
+    text = r'{"a": "x\ny \"q\" \\ é “z”", "b": 1,}'
+    assert extract_json(text) == {"a": 'x\ny "q" \\ é “z”', "b": 1}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"a": "zei "ja" en "nee"", "b": ["x"\n  "y",], "c": {"d": 1]}',
+        '{"a": {"b": [1, 2}, "c": "d"}]',
+        '{"a": ["x" "y"], "b": 2 "c": 3,}',
+    ],
+)
+def test_repaired_fast_path_matches_extractor(text):
+    extractor = JsonExtractor()
+    extractor.feed(text)
+    assert extract_json(text) == extractor.result()
+
+
+def test_no_object_raises():
+    with pytest.raises(ValueError):
+        extract_json("Sorry, ik kan dit artikel niet analyseren.")
+
+
+def test_truncated_mid_value_keeps_completed_members():
+    assert extract_json('{"a": "klaar", "b": tru') == {"a": "klaar"}
+
+
+@pytest.mark.parametrize("name", sorted(name for name in os.listdir(CORPUS) if name.endswith(".txt")))
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_feeding_in_chunks_matches_one_pass(name, chunk_size):
+    with open(os.path.join(CORPUS, name), encoding="utf-8") as f:
+        text = f.read()
+    extractor = JsonExtractor()
+    for start in range(0, len(text), chunk_size):
+        extractor.feed(text[start:start + chunk_size])
+    assert extractor.result() == extract_json(text)
+
+
+def test_corpus_is_recovered():
+    for name in os.listdir(CORPUS):
+        with open(os.path.join(CORPUS, name), encoding="utf-8") as f:
+            result = extract_json(f.read())
+        assert "claim_summary" in result and "critical_questions" in result, name
+
+
+def test_completed_only_returns_finished_members():
+    extractor = JsonExtractor()
+    extractor.feed('{"claim_summary": "De ')
+    assert extractor.completed() == {}
+    extractor.feed('rente daalt", "critical_questions": ["Vraag')
+    assert extractor.completed() == {"claim_summary": "De rente daalt"}
+    extractor.feed(': x"], "impact')
+    assert extractor.completed() == {"claim_summary": "De rente daalt", "critical_questions": ["Vraag: x"]}
+
+
+def test_literal_split_across_chunks():
+    extractor = JsonExtractor()
+    for part in ('{"a": tr', 'ue, "b": 12', '3}'):
+        extractor.feed(part)
+    assert extractor.result() == {"a": True, "b": 123}
+
+
+def test_quote_at_chunk_boundary_waits_for_what_follows():
+    extractor = JsonExtractor()
+    extractor.feed('{"a": "zei "')
+    extractor.feed('nee" en ging", "b": 1}')
+    assert extractor.result() == {"a": 'zei "nee" en ging', "b": 1}
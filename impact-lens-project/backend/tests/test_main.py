@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+# main opens its job queue on import; keep it out of the working directory
+os.environ.setdefault("JOBS_DB", ":memory:")
+
+import main  # noqa: E402
+from bench import fake_gemini  # noqa: E402
+from cache import TTLCache  # noqa: E402
+from neardup import NearDuplicateIndex  # noqa: E402
+
+SENTENCES = [
+    f"Het college van gemeente {place} trekt volgend jaar {amount} miljoen euro extra uit voor {topic}."
+    for place, amount, topic in [
+        ("Utrecht", 12, "betaalbare huurwoningen"),
+        ("Zwolle", 4, "fietsenstallingen bij het station"),
+        ("Groningen", 9, "het versterken van woningen"),
+        ("Tilburg", 3, "schoolgebouwen in de wijken"),
+        ("Arnhem", 7, "groen op bedrijventerreinen"),
+        ("Leiden", 5, "het openbaar vervoer naar het ziekenhuis"),
+        ("Breda", 6, "sportverenigingen met een tekort"),
+        ("Almere", 8, "jongerenwerk in de avonduren"),
+    ]
+]
+OTHER_SENTENCES = [
+    f"De rechtbank in {city} doet op {day} uitspraak in de zaak over {case}, meldt een woordvoerder."
+    for city, day, case in [
+        ("Den Haag", "maandag", "de stikstofvergunning"),
+        ("Amsterdam", "dinsdag", "de demonstratie op de Dam"),
+        ("Rotterdam", "woensdag", "de havenstaking"),
+        ("Maastricht", "donderdag", "het vliegveld"),
+        ("Haarlem", "vrijdag", "de kap van oude bomen"),
+    ]
+]
+
+
+def analysis(claim: str, questions=None, impacts=None) -> str:
+    """A model response in the shape the analysis prompt asks for"""
+    return "```json\n" + json.dumps({
+        "claim_summary": claim,
+        "critical_questions": questions or ["Vraag: Wie betaalt dit? | Antwoord: De gemeenten zelf."],
+        "impact_summary": impacts or ["Impact punt 1: meer geld voor wonen"],
+        "sources": [{"title": "Bron", "url": "https://example.nl/bron"}],
+    }, ensure_ascii=False) + "\n```"
+
+
+def article(sentences=SENTENCES, url: str = "https://example.nl/nieuws/1", **fields) -> dict:
+    return {"url": url, "title": "Gemeenten investeren", "text": "\n".join(sentences), "language": "nl", **fields}
+
+
+async def call(*requests):
+    """Send (method, path, kwargs) requests in order through the ASGI app"""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [await client.request(method, path, **kwargs) for method, path, kwargs in requests]
+
+
+def post(path: str, body: dict, **kwargs) -> httpx.Response:
+    return asyncio.run(call(("POST", path, {"json": body, **kwargs})))[0]
+
+
+@pytest.fixture
+def gemini(tmp_path, monkeypatch):
+    """Fresh caches, and a fake Gemini that replays the given responses in order"""
+    monkeypatch.setattr(main, "analysis_cache", TTLCache())
+    monkeypatch.setattr(main, "article_revisions", TTLCache(table="revisions"))
+    monkeypatch.setattr(main, "answer_cache", TTLCache(table="answers"))
+    monkeypatch.setattr(main, "near_duplicates", NearDuplicateIndex(threshold=0.8))
+
+    def replay(*responses: str) -> fake_gemini.FakeConfig:
+        for index, response in enumerate(responses):
+            (tmp_path / f"{index:02d}.txt").write_text(response, encoding="utf-8")
+        return fake_gemini.install(latency=0, jitter=0, corpus_dir=str(tmp_path))
+
+    return replay
+
+
+def test_analysis_is_cached_and_revalidated_with_etag(gemini):
+    fake = gemini(analysis("Gemeenten investeren in wonen."))
+    first, again = asyncio.run(call(("POST", "/analyze", {"json": article()}), ("POST", "/analyze", {"json": article()})))
+    assert first.status_code == 200 and again.json() == first.json()
+    assert fake.calls == 1
+
+    etag, location = first.headers["etag"], first.headers["content-location"]
+    fresh, revalidated = asyncio.run(call(
+        ("GET", location, {}),
+        ("GET", location, {"headers": {"If-None-Match": etag}}),
+    ))
+    assert fresh.status_code == 200 and fresh.headers["etag"] == etag
+    assert fresh.headers["cache-control"] == f"public, max-age={main.ANALYSIS_HTTP_MAX_AGE}"
+    assert revalidated.status_code == 304 and revalidated.content == b""
+
+
+def test_unparseable_output_is_not_cached(gemini):
+    fake = gemini("Sorry, dit artikel kan ik niet analyseren.")
+    first = post("/analyze", article())
+    assert first.status_code == 200
+    post("/analyze", article())
+    assert fake.calls == 2
+
+
+def test_stored_outcomes(gemini):
+    gemini(analysis("Gemeenten investeren in wonen."))
+    request = main.AnalyzeRequest(**article())
+    prepared = main.prepare_request(request)
+    key = main.analysis_cache_key(request)
+    revision = main.revision_key(request.url, "nl", main.PROMPT_VERSION)
+
+    def max_age() -> int:
+        response = asyncio.run(call(("GET", f"/analysis/{key}", {})))[0]
+        return int(response.headers["cache-control"].rsplit("=", 1)[1])
+
+    main.store_analysis(request, prepared, key, {"claim_summary": "x"}, outcome="failed")
+    assert main.analysis_cache.get(key) is None
+
+    # Degraded: cached briefly, also by browsers, and not a baseline for near-duplicates or updates
+    main.store_analysis(request, prepared, key, {"claim_summary": "x"}, outcome="degraded")
+    assert main.analysis_cache.get(key) == {"claim_summary": "x"}
+    assert max_age() <= main.DEGRADED_CACHE_TTL
+    assert main.near_duplicates.stats()["entries"] == 0
+    assert main.article_revisions.get(revision) is None
+
+    main.store_analysis(request, prepared, key, {"claim_summary": "x"})
+    assert max_age() == main.ANALYSIS_HTTP_MAX_AGE
+    assert main.near_duplicates.stats()["entries"] == 1
+    assert main.article_revisions.get(revision)["analysis"] == {"claim_summary": "x"}
+
+
+def test_stream_sends_claim_then_analysis_then_questions_then_done(gemini):
+    gemini(analysis("Gemeenten investeren in wonen.", questions=[
+        "Vraag: Wat kost een huurwoning? | Antwoord: Niet vermeld in artikel",
+        "Vraag: Wie betaalt dit? | Antwoord: De gemeenten zelf.",
+    ]))
+    response = post("/analyze/stream", article())
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["claim_summary", "analysis", "question", "done"]
+    assert events[0]["data"] == "Gemeenten investeren in wonen."
+    assert events[2]["index"] == 0 and "Online informatie" in events[2]["data"]
+    assert events[3]["data"]["critical_questions"][0] == events[2]["data"]
+
+
+def test_batch_analyzes_identical_items_once(gemini):
+    fake = gemini(analysis("Gemeenten investeren in wonen."), analysis("Een ander verhaal."))
+    items = [
+        article(),
+        article(url="https://example.nl/nieuws/1#reacties"),
+        article(sentences=["Te kort."]),
+        article(sentences=OTHER_SENTENCES, url="https://example.nl/nieuws/2"),
+    ]
+    response = post("/analyze/batch", {"items": items})
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+
+    assert [line["status"] for line in lines] == ["ok", "ok", "error", "ok"]
+    assert lines[0]["result"] == lines[1]["result"]
+    assert lines[2]["status_code"] == 400
+    assert fake.calls == 2
+
+
+def test_batch_above_the_limit_is_refused(gemini, monkeypatch):
+    gemini(analysis("Gemeenten investeren in wonen."))
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    assert post("/analyze/batch", {"items": [article()] * 3}).status_code == 413
+
+
+def test_small_change_sends_only_new_passages(gemini):
+    fake = gemini(
+        analysis("Gemeenten investeren in wonen."),
+        json.dumps({"claim_summary": "Gemeenten investeren in wonen en vervoer.", "critical_questions": [], "impact_summary": []}),
+    )
+    post("/analyze", article(SENTENCES[:6]))
+    updated = post("/analyze", article(SENTENCES[:7]))
+    assert fake.calls == 2
+    assert updated.json()["claim_summary"] == "Gemeenten investeren in wonen en vervoer."
+    assert updated.json()["critical_questions"] == ["Vraag: Wie betaalt dit? | Antwoord: De gemeenten zelf."]
+
+
+def test_large_change_is_analyzed_in_full(gemini):
+    fake = gemini(analysis("Gemeenten investeren in wonen."), analysis("Een heel ander artikel."))
+    post("/analyze", article(SENTENCES[:4]))
+    rewritten = post("/analyze", article(SENTENCES[:2] + SENTENCES[4:]))
+    assert fake.calls == 2
+    assert rewritten.json()["claim_summary"] == "Een heel ander artikel."
+
+
+def test_removed_passages_reuse_the_previous_analysis(gemini):
+    fake = gemini(analysis("Gemeenten investeren in wonen."))
+    first = post("/analyze", article())
+    shorter = post("/analyze", article(SENTENCES[:-1]))
+    assert fake.calls == 1
+    assert shorter.json()["claim_summary"] == first.json()["claim_summary"]
+    assert shorter.json()["word_count"] < first.json()["word_count"]
+
+
+def test_update_replaces_questions_asked_again_and_keeps_list_length():
+    previous = {
+        "claim_summary": "Oud",
+        "critical_questions": [f"Vraag: Vraag {i}? | Antwoord: Oud antwoord" for i in range(7)],
+        "impact_summary": ["Impact punt 1: a"],
+        "sources": [{"title": "Bron", "url": "https://example.nl/bron"}],
+    }
+    update = {
+        "claim_summary": " ",
+        "critical_questions": [{"Vraag": "vraag 3", "| Antwoord": "Nieuw antwoord"}, "Vraag: Nieuwe vraag? | Antwoord: Ja"],
+        "impact_summary": ["Impact punt 2: b", "impact punt 1: A"],
+        "sources": [{"title": "Bron", "url": "https://example.nl/bron"}, {"title": "Nieuw", "url": "https://example.nl/nieuw"}],
+    }
+    merged = main.merge_update(previous, update)
+
+    assert merged["claim_summary"] == "Oud"
+    questions = merged["critical_questions"]
+    assert questions[:2] == ["Vraag: vraag 3 | Antwoord: Nieuw antwoord", "Vraag: Nieuwe vraag? | Antwoord: Ja"]
+    assert "Vraag: Vraag 3? | Antwoord: Oud antwoord" not in questions
+    assert len(questions) == 7
+    assert merged["impact_summary"] == ["Impact punt 2: b", "impact punt 1: A"]
+    assert [source["url"] for source in merged["sources"]] == ["https://example.nl/bron", "https://example.nl/nieuw"]
+
+
+def test_merge_analyses_interleaves_chunks_and_prefers_answers():
+    first = {
+        "claim_summary": "Hoofdclaim",
+        "critical_questions": ["Vraag: A? | Antwoord: Niet vermeld in artikel", "Vraag: B? | Antwoord: b"],
+        "impact_summary": ["Impact 1", "Impact 2"],
+        "sources": [{"title": "Bron", "url": "https://example.nl/1"}],
+    }
+    second = {
+        "claim_summary": "Bijzaak",
+        "critical_questions": ["Vraag: C? | Antwoord: c", "vraag: a? | Antwoord: a"],
+        "impact_summary": ["impact 1", "Impact 3"],
+        "sources": [{"title": "Bron", "url": "https://example.nl/1"}, {"title": "Twee", "url": "https://example.nl/2"}],
+    }
+    unparsed = {**first, "claim_summary": "Kon JSON niet verwerken", "fallback": True}
+    merged = main.merge_analyses([first, unparsed, second])
+
+    assert merged["claim_summary"] == "Hoofdclaim"
+    assert merged["critical_questions"] == ["vraag: a? | Antwoord: a", "Vraag: C? | Antwoord: c", "Vraag: B? | Antwoord: b"]
+    assert merged["impact_summary"] == ["Impact 1", "Impact 2", "Impact 3"]
+    assert [source["url"] for source in merged["sources"]] == ["https://example.nl/1", "https://example.nl/2"]
+
+    many = {**first, "critical_questions": [f"Vraag: {i}? | Antwoord: ja" for i in range(8)]}
+    assert len(main.merge_analyses([many])["critical_questions"]) == main.MAX_MERGED_ITEMS
+    assert main.merge_analyses([unparsed])["fallback"] is True
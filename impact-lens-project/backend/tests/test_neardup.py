@@ -0,0 +1,75 @@
+import random
+
+from neardup import NearDuplicateIndex, signature, similarity
+
+WORDS = ("de", "het", "kabinet", "wil", "meer", "geld", "voor", "zorg", "onderwijs", "defensie", "gemeenten",
+         "volgens", "minister", "kamer", "debat", "plannen", "begroting", "jaar", "miljard", "euro")
+
+
+def article(seed: int, length: int = 300) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(50)) for _ in range(length))
+
+
+def edited(text: str, every: int) -> str:
+    words = text.split()
+    return " ".join("anders" if index % every == 0 else word for index, word in enumerate(words))
+
+
+def test_short_texts_have_no_signature():
+    assert signature("Te kort om iets over te zeggen.") is None
+
+
+def test_signature_is_stable_and_estimates_similarity():
+    text = article(1)
+    assert signature(text) == signature(text)
+    assert similarity(signature(text), signature(text)) == 1.0
+    assert similarity(signature(text), signature(article(2))) < 0.2
+
+
+def test_syndicated_copy_is_found():
+    index = NearDuplicateIndex(threshold=0.8)
+    text = article(1)
+    index.add("nl:v1", "origineel", signature(text))
+    # A few words changed, as when a site adds its own byline
+    match = index.find("nl:v1", signature(edited(text, 100)))
+    assert match is not None and match[0] == "origineel" and match[1] >= 0.8
+    assert index.find("nl:v1", signature(article(2))) is None
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 1
+
+
+def test_namespaces_are_separate():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("nl:v1", "origineel", signature(article(1)))
+    assert index.find("en:v1", signature(article(1))) is None
+    assert index.find("nl:v2", signature(article(1))) is None
+
+
+def test_oldest_entries_are_evicted():
+    index = NearDuplicateIndex(threshold=0.8, max_entries=2)
+    for seed in range(3):
+        index.add("nl", f"key{seed}", signature(article(seed)))
+    assert index.stats()["entries"] == 2
+    assert index.find("nl", signature(article(0))) is None
+    assert index.find("nl", signature(article(2)))[0] == "key2"
+
+
+def test_disabled_index_finds_nothing():
+    index = NearDuplicateIndex(max_entries=0)
+    index.add("nl", "key", signature(article(1)))
+    assert index.find("nl", signature(article(1))) is None
+
+
+def test_entries_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "neardup.db")
+    NearDuplicateIndex(threshold=0.8, db_path=db_path).add("nl", "key", signature(article(1)))
+    restarted = NearDuplicateIndex(threshold=0.8, db_path=db_path)
+    assert restarted.find("nl", signature(article(1)))[0] == "key"
+
+
+def test_entries_from_other_processes_are_picked_up(tmp_path):
+    db_path = str(tmp_path / "neardup.db")
+    reader = NearDuplicateIndex(threshold=0.8, db_path=db_path)
+    NearDuplicateIndex(threshold=0.8, db_path=db_path).add("nl", "key", signature(article(1)))
+    reader._synced_at -= reader.SYNC_INTERVAL
+    assert reader.find("nl", signature(article(1)))[0] == "key"
@@ -0,0 +1,77 @@
+from textprep import diff_segments, prepare_article, segment_hashes, split_segments, strip_boilerplate
+
+
+def test_split_segments_on_sentences_and_newlines():
+    text = 'Eerste zin. "Tweede zin!" Derde zin?\nKop zonder punt\n\n  Laatste'
+    assert split_segments(text) == ["Eerste zin.", '"Tweede zin!"', "Derde zin?", "Kop zonder punt", "Laatste"]
+
+
+def test_segment_hashes_ignore_case_and_spacing():
+    assert segment_hashes(["De  Rente daalt."]) == segment_hashes(["de rente\ndaalt."])
+    assert segment_hashes(["De rente daalt."]) != segment_hashes(["De rente stijgt."])
+
+
+def test_diff_unchanged_and_reordered():
+    previous = segment_hashes(["a.", "b.", "c."])
+    assert diff_segments(previous, previous) == ([], 0)
+    # A live blog that puts the newest update on top
+    assert diff_segments(previous, segment_hashes(["nieuw.", "a.", "b.", "c."])) == ([0], 0)
+
+
+def test_diff_edits_and_removals():
+    previous = segment_hashes(["a.", "b.", "c."])
+    current = segment_hashes(["a.", "b aangepast.", "d.", "e."])
+    assert diff_segments(previous, current) == ([1, 2, 3], 2)
+    assert diff_segments(previous, segment_hashes(["a."])) == ([], 2)
+
+
+def test_diff_counts_duplicates():
+    previous = segment_hashes(["Lees ook.", "Lees ook."])
+    assert diff_segments(previous, segment_hashes(["Lees ook."] * 3)) == ([2], 0)
+
+
+def test_strip_boilerplate_drops_page_furniture():
+    segments = [
+        "Het kabinet trekt extra geld uit voor de zorg.",
+        "Dat maakte de minister dinsdag bekend.",
+        "Accepteer alle cookies",
+        "Lees ook: Kamer wil debat over zorgkosten",
+        "Volg ons",
+        "De oppositie noemt het bedrag te laag.",
+        "Volg ons",
+        "© 2024 Nieuwsbron",
+    ]
+    assert strip_boilerplate(segments) == [
+        "Het kabinet trekt extra geld uit voor de zorg.",
+        "Dat maakte de minister dinsdag bekend.",
+        "De oppositie noemt het bedrag te laag.",
+    ]
+
+
+def test_strip_boilerplate_keeps_news_about_cookies_and_logins():
+    segments = [
+        "Accepteer cookies of betaal: de nieuwe regel van de toezichthouder.",
+        "Nieuwssites moeten lezers een echte keuze geven.",
+        "Log in",
+        "Log in of betaal, dat is de keuze voor lezers.",
+        "Accepteren is voortaan niet meer verplicht.",
+        "Subscribe-knoppen worden duidelijker.",
+        "Wij gebruiken cookies om bezoekers te volgen, zegt het bedrijf in een verklaring aan de rechter.",
+    ]
+    # The lede is protected and only the bare button is dropped
+    assert strip_boilerplate(segments) == segments[:2] + segments[3:]
+
+
+def test_strip_boilerplate_drops_repeated_short_segments():
+    segments = ["Kop van het artikel.", "Eerste alinea.", "Door Jan Jansen", "Tweede alinea.", "Door Jan Jansen"]
+    assert strip_boilerplate(segments) == ["Kop van het artikel.", "Eerste alinea.", "Tweede alinea."]
+
+
+def test_prepare_article_fits_the_budget():
+    text = " ".join(f"Zin nummer {index} gaat over de begroting van het kabinet." for index in range(200))
+    short = prepare_article(text, token_budget=100000, chunk_threshold=200000, max_chunks=4)
+    assert short.chunks == [] and short.word_count == 2000
+    trimmed = prepare_article(text, token_budget=500, chunk_threshold=200000, max_chunks=4)
+    assert trimmed.tokens <= 500 and trimmed.text.startswith("Zin nummer 0 ")
+    chunked = prepare_article(text, token_budget=1000, chunk_threshold=2000, max_chunks=4)
+    assert 1 < len(chunked.chunks) <= 4
@@ -0,0 +1,193 @@
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Rough subword tokenizer: words are split into pieces of up to 4 characters and
+# every punctuation mark counts as one token, which tracks Gemini's counts for
+# Dutch/English news text closely enough for budgeting
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\w{4,}")
+
+# Whitespace after a sentence end (optionally followed by a closing quote or bracket),
+# plus newlines when the client kept them
+_SEGMENT_BREAK = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"'”’)])\s+|\s*\n\s*")
+
+# Scraped page furniture in the languages we support: buttons and banners that make up a
+# whole segment, and lead-ins of links and footers. News about cookie walls or
+# subscriptions is article text, so phrases only count as whole words in short segments
+_BOILERPLATE_SEGMENT = re.compile(
+    r"(?:(?:accepteer|accept|aceptar)(?: alle| all| todas las)?(?: cookies)?|(?:ik ga )?akkoord|"
+    r"cookie-?(?:instellingen|beleid|verklaring|settings|policy|voorkeuren)|privacyverklaring|privacy policy|"
+    r"log ?in|inloggen|abonneer(?: nu)?|subscribe(?: now)?|suscríbete|nieuwsbrief|newsletter|"
+    r"advertentie|advertisement|deel dit artikel|share this article|volg ons|follow us)[.!]?"
+)
+_BOILERPLATE_PREFIX = re.compile(
+    r"(?:lees ook|lees meer|read more|related articles|gerelateerde artikelen|weiterlesen|"
+    r"(?:we|wij) (?:use|gebruiken) cookies|deze (?:site|website) gebruikt cookies|"
+    r"(?:schrijf je in voor|abonneer je op|meld je aan voor|sign up for) (?:onze |de |our )?(?:nieuwsbrief|newsletter)|"
+    r"alle rechten voorbehouden|all rights reserved|©)(?=$|[\s:|›»>.!,])"
+)
+# Segments of at least this many words are always kept
+BOILERPLATE_MAX_WORDS = 10
+# The lede is never dropped, whatever it looks like
+PROTECTED_SEGMENTS = 2
+
+
+@dataclass
+class PreparedArticle:
+    text: str
+    word_count: int
+    tokens: int
+    # Only filled for articles too long for one model call
+    chunks: List[str] = field(default_factory=list)
+
+
+def estimate_tokens(text: str) -> int:
+    return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+
+def split_segments(text: str) -> List[str]:
+    return [segment for segment in _SEGMENT_BREAK.split(text.strip()) if segment]
+
+
+def segment_hashes(segments: List[str]) -> List[str]:
+    """Short content hashes of segments, ignoring case and spacing"""
+    return [
+        hashlib.blake2b(" ".join(segment.lower().split()).encode("utf-8"), digest_size=8).hexdigest()
+        for segment in segments
+    ]
+
+
+def diff_segments(previous: List[str], current: List[str]) -> Tuple[List[int], int]:
+    """Indices of current segment hashes that are new (added or edited), and how many previous ones are gone.
+
+    Order is ignored: a live blog that puts its newest update on top has not
+    changed its older segments by moving them down.
+    """
+    remaining = Counter(previous)
+    added = []
+    for index, segment_hash in enumerate(current):
+        if remaining[segment_hash] > 0:
+            remaining[segment_hash] -= 1
+        else:
+            added.append(index)
+    return added, sum(remaining.values())
+
+
+def strip_boilerplate(segments: List[str]) -> List[str]:
+    """Drop short cookie/newsletter/navigation segments and short segments that repeat on the page"""
+    counts = Counter(" ".join(segment.lower().split()) for segment in segments)
+    kept = []
+    seen = set()
+    for index, segment in enumerate(segments):
+        key = " ".join(segment.lower().split())
+        if key in seen:
+            continue
+        seen.add(key)
+        words = len(key.split())
+        if index >= PROTECTED_SEGMENTS and words < BOILERPLATE_MAX_WORDS:
+            # Short repeated segments are menus, bylines and share buttons
+            if counts[key] > 1 or is_boilerplate(key):
+                continue
+        kept.append(segment)
+    return kept
+
+
+def is_boilerplate(key: str) -> bool:
+    """Whether a lowercased segment is a button or banner, or opens like a link or footer"""
+    return _BOILERPLATE_SEGMENT.fullmatch(key) is not None or _BOILERPLATE_PREFIX.match(key) is not None
+
+
+def select_salient(segments: List[str], token_counts: List[int], budget: int) -> List[int]:
+    """Indices of the most informative segments that fit in the token budget, in article order.
+
+    The lede and the conclusion go first so neither is lost; the rest is ranked
+    by how many of the article's recurring terms a segment contains.
+    """
+    words_per_segment = [[word.lower() for word in _WORD_PATTERN.findall(segment)] for segment in segments]
+    frequencies = Counter(word for words in words_per_segment for word in set(words))
+    scores = [
+        sum(frequencies[word] for word in set(words)) / (len(words) + 5)
+        for words in words_per_segment
+    ]
+    ends = list(range(min(3, len(segments)))) + list(range(max(3, len(segments) - 2), len(segments)))
+    ranked = sorted(range(len(segments)), key=lambda i: scores[i], reverse=True)
+
+    chosen = set()
+    used = 0
+    for index in ends + ranked:
+        if index not in chosen and used + token_counts[index] <= budget:
+            chosen.add(index)
+            used += token_counts[index]
+    return sorted(chosen)
+
+
+def split_long_segments(segments: List[str], token_counts: List[int], limit: int) -> None:
+    """Break segments over the limit (text scraped without punctuation) into word windows, in place"""
+    index = 0
+    while index < len(segments):
+        if token_counts[index] > limit:
+            words = segments[index].split()
+            pieces = -(-token_counts[index] // limit)
+            size = -(-len(words) // pieces)
+            windows = [" ".join(words[start:start + size]) for start in range(0, len(words), size)]
+            segments[index:index + 1] = windows
+            token_counts[index:index + 1] = [estimate_tokens(window) for window in windows]
+            index += len(windows)
+        else:
+            index += 1
+
+
+def chunk_segments(segments: List[str], token_counts: List[int], budget: int) -> List[str]:
+    chunks = []
+    current: List[str] = []
+    used = 0
+    for segment, tokens in zip(segments, token_counts):
+        if current and used + tokens > budget:
+            chunks.append(" ".join(current))
+            current, used = [], 0
+        current.append(segment)
+        used += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def prepare_article(text: str, token_budget: int, chunk_threshold: int, max_chunks: int) -> PreparedArticle:
+    """Clean scraped text and fit it to the model budget.
+
+    Up to token_budget tokens the cleaned text is used as is. Up to
+    chunk_threshold, the most salient segments within the budget are kept.
+    Beyond that the article is split into chunks of token_budget tokens for
+    map-reduce analysis, after salient selection if it would need more than
+    max_chunks chunks.
+    """
+    word_count = len(text.split())
+    segments = split_segments(text)
+    cleaned = strip_boilerplate(segments)
+    # Pages that are mostly repetition are better analyzed raw than emptied
+    if sum(len(segment) for segment in cleaned) * 4 >= sum(len(segment) for segment in segments):
+        segments = cleaned
+    token_counts = [estimate_tokens(segment) for segment in segments]
+    split_long_segments(segments, token_counts, max(1, token_budget // 8))
+    tokens = sum(token_counts)
+
+    if tokens > chunk_threshold:
+        # Leave some room, chunks rarely end exactly on the budget
+        chunked_budget = int(token_budget * max_chunks * 0.9)
+        if tokens > chunked_budget:
+            chosen = select_salient(segments, token_counts, chunked_budget)
+            segments = [segments[index] for index in chosen]
+            token_counts = [token_counts[index] for index in chosen]
+        chunks = chunk_segments(segments, token_counts, token_budget)
+        if len(chunks) > 1:
+            return PreparedArticle(" ".join(segments), word_count, sum(token_counts), chunks)
+
+    if tokens > token_budget:
+        chosen = select_salient(segments, token_counts, token_budget)
+        segments = [segments[index] for index in chosen]
+        tokens = sum(token_counts[index] for index in chosen)
+
+    return PreparedArticle(" ".join(segments), word_count, tokens)
@@ -1,6 +1,9 @@
 // Background service worker
 const API_BASE_URL = 'https://impact-lens-api-602723277830.europe-west1.run.app';
 
+// Analyses kept per article URL, revalidated with If-None-Match while the article is unchanged
+const MAX_STORED_ANALYSES = 50;
+
 // Import ExtensionPay
 importScripts('ExtPay.js');
 const extpay = ExtPay('impact-lens-news'); // Replace with your actual extension ID from ExtensionPay
@@ -68,24 +71,41 @@ async function analyzeContent(content) {
 
     console.log('Sending API request:', requestBody);
 
-    const response = await fetch(`${API_BASE_URL}/analyze`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(requestBody)
-    });
-
-    console.log('API response status:', response.status);
+    // The same article as last time: revalidate the stored analysis at its Content-Location
+    // (answered with 304 and no body while it is current) instead of analyzing it again
+    const { storedAnalyses = {} } = await chrome.storage.local.get('storedAnalyses');
+    const key = storedAnalysisKey(requestBody);
+    const textHash = await sha256(JSON.stringify(requestBody));
+    const stored = storedAnalyses[key];
+    let result = stored && stored.textHash === textHash ? await revalidate(stored) : null;
+
+    if (result !== null) {
+      await storeAnalysis(storedAnalyses, key, stored);
+    } else {
+      const response = await fetch(`${API_BASE_URL}/analyze`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(requestBody)
+      });
+
+      console.log('API response status:', response.status);
+
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.log('API error response:', errorText);
+        throw new Error(`API error: ${response.status} - ${errorText}`);
+      }
 
-    if (!response.ok) {
-      const errorText = await response.text();
-      console.log('API error response:', errorText);
-      throw new Error(`API error: ${response.status} - ${errorText}`);
+      result = await response.json();
+      const etag = response.headers.get('ETag');
+      const location = response.headers.get('Content-Location');
+      if (etag && location) {
+        await storeAnalysis(storedAnalyses, key, { textHash, etag, location, result });
+      }
     }
 
-    const result = await response.json();
-
     // Track usage for free users
     if (!user.paid) {
       await trackUsage(result.word_count);
@@ -104,6 +124,47 @@ async function analyzeContent(content) {
   }
 }
 
+function storedAnalysisKey(requestBody) {
+  return `${requestBody.language}|${requestBody.url}`;
+}
+
+// The stored result if the API confirms it is current, the new one if it changed, or null
+// when the analysis is no longer available there
+async function revalidate(stored) {
+  try {
+    const response = await fetch(`${API_BASE_URL}${stored.location}`, {
+      headers: { 'If-None-Match': stored.etag }
+    });
+    console.log('Revalidation status:', response.status);
+    if (response.status === 304) {
+      return stored.result;
+    }
+    if (response.ok) {
+      stored.etag = response.headers.get('ETag') || stored.etag;
+      stored.result = await response.json();
+      return stored.result;
+    }
+  } catch (error) {
+    console.log('Revalidation failed:', error);
+  }
+  return null;
+}
+
+async function sha256(text) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+async function storeAnalysis(storedAnalyses, key, entry) {
+  storedAnalyses[key] = { ...entry, storedAt: Date.now() };
+  // Drop the oldest entries beyond the limit
+  const keys = Object.keys(storedAnalyses).sort((a, b) => storedAnalyses[a].storedAt - storedAnalyses[b].storedAt);
+  for (const oldKey of keys.slice(0, Math.max(0, keys.length - MAX_STORED_ANALYSES))) {
+    delete storedAnalyses[oldKey];
+  }
+  await chrome.storage.local.set({ storedAnalyses });
+}
+
 // Handle extension icon click
 chrome.action.onClicked.addListener((tab) => {
   chrome.sidePanel.open({ tabId: tab.id });